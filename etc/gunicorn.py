@@ -1,9 +1,28 @@
+"""
+Gunicorn config with two worker profiles. Set the profile with GUNICORN_PROFILE.
+
+- `sync` (default): every worker process serves one request at a time.
+- `gthread`: every worker serves GUNICORN_THREADS requests in threads,
+  so workers keep serving while some requests wait on postgres, redis or smtp.
+  Django keeps a separate persistent db connection for every thread,
+  so postgres should accept `workers * threads` connections plus celery ones.
+
+Compare profiles with `python manage.py benchmark_load` against the running app.
+"""
 import multiprocessing
 import os
 
-default_workers = multiprocessing.cpu_count() * 2 + 1
+profile = os.environ.get('GUNICORN_PROFILE', 'sync')
+assert profile in ('sync', 'gthread'), f'Unknown gunicorn profile "{profile}".'
+
+if profile == 'gthread':
+    default_workers = multiprocessing.cpu_count() + 1
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+else:
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+
 workers = os.environ.get('WEB_CONCURRENCY', default_workers)
-worker_class = 'sync'
+worker_class = profile
 max_requests = 300
 max_requests_jitter = 300
 timeout = 120
@@ -4,4 +4,6 @@ from __future__ import absolute_import, unicode_literals
 # Django starts so that shared_task will use this app.
 from shopelectro.celery import app as celery_app
 
+default_app_config = 'shopelectro.apps.ShopelectroConfig'
+
 __all__ = ['celery_app']
@@ -1,18 +1,25 @@
+import json
+import typing
+from uuid import uuid4
+
 from django.conf import settings
+from django.conf.urls import url
 from django.contrib import admin
 from django.contrib.admin.widgets import FilteredSelectMultiple
 from django.contrib.redirects.models import Redirect
-from django.db import models as django_models
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connection, models as django_models
+from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 from django_select2.forms import ModelSelect2Widget
 
-from ecommerce import mailer
 from ecommerce.models import Position
 from generic_admin import inlines, mixins, models, sites, filters
 from pages.models import CustomPage, FlatPage, PageTemplate
-from shopelectro import models as se_models
+from shopelectro import mail, models as se_models, profiling, tasks
 from shopelectro.views.admin import TableEditor
 
 
@@ -21,6 +28,130 @@ class SEAdminSite(sites.SiteWithTableEditor):
     site_header = 'Shopelectro administration'
     table_editor_view = TableEditor
 
+    def get_urls(self):
+        return [
+            url(r'^profiles/$', self.admin_view(self.profiles_view), name='profiles'),
+            url(
+                r'^order-emails/(?P<job_id>\w+)/$',
+                self.admin_view(self.order_emails_view),
+                name='order_emails',
+            ),
+            *super().get_urls(),
+        ]
+
+    def profiles_view(self, request):
+        """Show the last sampled requests profiles of the current worker."""
+        return TemplateResponse(request, 'admin/profiles.html', {
+            **self.each_context(request),
+            'title': _('Request profiles'),
+            'profiles': profiling.profiles.all(),
+            'sample_rate': settings.PROFILING['sample_rate'],
+        })
+
+    def order_emails_view(self, request, job_id):
+        """Show the progress of the order emails batch."""
+        return TemplateResponse(request, 'admin/order_emails.html', {
+            **self.each_context(request),
+            'title': _('Order emails'),
+            'batch': mail.get_batch(job_id),
+        })
+
+
+def estimate_count(qs: django_models.QuerySet) -> int:
+    """Return the postgres planner estimate of the queryset rows count."""
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, that doesn't count big changelists exactly.
+
+    The exact count of pages joined with products takes seconds.
+    Changelists, that are estimated to be bigger than `settings.ADMIN_EXACT_COUNT_LIMIT`,
+    show the planner estimate. Smaller ones are counted exactly.
+    Use it with `show_full_result_count = False`, otherwise the total count is exact.
+
+    The estimate of the filtered changelist may be far from the real count.
+    So pages are checked against the fetched rows instead of the estimate,
+    and the last fetched page clamps the count.
+    """
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, django_models.QuerySet):
+            return super().count
+        estimate = estimate_count(self.object_list)
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    def page(self, number):
+        count = self.count
+        if not self.estimated:
+            return super().page(number)
+
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+
+        bottom = (number - 1) * self.per_page
+        # the extra row tells, whether the next page exists
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        fetched = bottom + len(rows)
+        self.__dict__['count'] = max(count, fetched + 1) if has_next else fetched
+        self.__dict__.pop('num_pages', None)
+        return self._get_page(rows, number, self)
+
+
+def annotated_column(annotation: str, description: str):
+    """
+    List display column with the annotation of the changelist queryset.
+
+    Annotate the queryset in `get_queryset`, so the column doesn't query the db per row.
+    """
+    def column(admin_model, obj):
+        return getattr(obj, annotation)
+
+    column.short_description = description
+    column.admin_order_field = annotation
+    return column
+
+
+class ChangeUrl:
+    """Admin change url of the model. It's reversed once and takes ids of every row."""
+
+    PLACEHOLDER = '__id__'
+
+    def __init__(self, model: typing.Type[django_models.Model]):
+        self.model = model
+
+    @cached_property
+    def template(self) -> str:
+        opts = self.model._meta
+        return reverse(
+            f'admin:{opts.app_label}_{opts.model_name}_change', args=(self.PLACEHOLDER,),
+        )
+
+    def __call__(self, id_) -> str:
+        return self.template.replace(self.PLACEHOLDER, str(id_))
+
 
 class ProductPriceFilter(filters.PriceRange):
 
@@ -147,6 +278,8 @@ class ProductPageAdmin(models.ProductPageAdmin):
 
     add = False
     delete = False
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     category_page_model = se_models.CategoryPage
     list_filter = [
         *models.ProductPageAdmin.list_filter,
@@ -213,10 +346,12 @@ class TagGroupAdmin(admin.ModelAdmin):
     inlines = [TagInline]
 
     def get_queryset(self, request):
-        return super(TagGroupAdmin, self).get_queryset(request).prefetch_related('tags')
+        return (
+            super(TagGroupAdmin, self).get_queryset(request)
+            .annotate(tags_count=django_models.Count('tags'))
+        )
 
-    def count_tags(self, obj):
-        return obj.tags.count()
+    count_tags = annotated_column('tags_count', _('Count tags'))
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -225,16 +360,16 @@ class TagAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'position', 'custom_group']
     list_display_links = ['name']
 
+    group_url = ChangeUrl(se_models.TagGroup)
+
     def get_queryset(self, request):
-        return super(TagAdmin, self).get_queryset(request).prefetch_related('group')
+        return super(TagAdmin, self).get_queryset(request).select_related('group')
 
     def custom_group(self, obj):
-        group = obj.group
-
         return format_html(
             '<a href="{url}">{group}</a>',
-            group=group,
-            url=reverse('admin:shopelectro_taggroup_change', args=(group.id, ))
+            group=obj.group,
+            url=self.group_url(obj.group_id),
         )
 
     custom_group.admin_order_field = 'group'
@@ -242,21 +377,18 @@ class TagAdmin(admin.ModelAdmin):
 
 
 def send_order_emails(admin_model, request, order_qs):
-    for order in order_qs:
-        context = {'shop': settings.SHOP}
-        if order.email:
-            mailer.send_order(
-                subject=settings.EMAIL_SUBJECTS['order'],
-                order=order,
-                extra_context=context,
-            )
-        else:
-            mailer.send_order(
-                subject=settings.EMAIL_SUBJECTS['one_click'],
-                order=order,
-                to_customer=False,
-                extra_context=context,
-            )
+    """Queue the single batch task with emails of all the selected orders."""
+    job_id = uuid4().hex
+    order_ids = list(order_qs.values_list('id', flat=True))
+    if getattr(settings, 'USE_CELERY', True):
+        tasks.send_orders_batch.delay(job_id, order_ids)
+    else:
+        tasks.send_orders_batch(job_id, order_ids)
+    admin_model.message_user(request, format_html(
+        'Emails of {count} orders are queued. <a href="{url}">Progress</a>',
+        count=len(order_ids),
+        url=reverse('admin:order_emails', args=(job_id,)),
+    ))
 
 
 send_order_emails.short_description = _('Sends email notifications about placed orders')
@@ -265,6 +397,8 @@ send_order_emails.short_description = _('Sends email notifications about placed
 class OrderAdmin(mixins.PermissionsControl):
 
     add = False
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [PositionInline]
     list_display = ['id_', 'name', 'email', 'phone', 'total_price', 'payment_type', 'paid']
     search_fields = ['name', 'email', 'phone']
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ShopelectroConfig(AppConfig):
+
+    name = 'shopelectro'
+
+    def ready(self):
+        # connect signal receivers
+        from shopelectro import signals  # Ignore PyFlakesBear
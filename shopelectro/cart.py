@@ -1,5 +1,34 @@
+"""
+Cart, that serves the most of requests without the session.
+
+Cart lines are snapshots of the products at the adding time: name, price,
+image, url, etc. So the header cart and the totals depend only on the lines.
+The digest of the lines is the cart version. It lives in the cookie,
+and the rendered cart state is cached by the version.
+Requests without the session have the empty cart, so the session
+of anonymous users is not loaded at all.
+
+The cookie is signed with the session key, so the version of the flushed
+or expired session is not trusted. The session without the valid version cookie
+is loaded once, e.g. after the login or the cookie expiration, and the cookie is set again.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import BadSignature, Signer
+from django.template.loader import render_to_string
+from django.utils.crypto import salted_hmac
+
 from ecommerce.cart import Cart
 
+VERSION_COOKIE = 'cart_version'
+EMPTY_VERSION = 'empty'
+STATE_KEY = 'cart_state:{}'
+STATE_TIMEOUT = int(timedelta(days=1).total_seconds())
+HEADER_TEMPLATE = 'ecommerce/header_cart.html'
+
 
 class SECart(Cart):
     """Override Cart class for Wholesale features."""
@@ -10,3 +39,71 @@ class SECart(Cart):
             **super().get_position_data(position),
             'vendor_code': position.vendor_code,
         }
+
+    @property
+    def version(self) -> str:
+        if not len(self):
+            return EMPTY_VERSION
+        lines = json.dumps(list(self), sort_keys=True, default=str)
+        # the digest is keyed, so the version doesn't disclose the lines
+        return salted_hmac('shopelectro.cart', lines).hexdigest()
+
+
+def get_signer(session_key: str) -> Signer:
+    return Signer(salt=f'shopelectro.cart:{session_key}')
+
+
+def get_version(request) -> str:
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return EMPTY_VERSION
+    try:
+        return get_signer(session_key).unsign(request.COOKIES.get(VERSION_COOKIE, ''))
+    except BadSignature:
+        # the middleware sets the cookie, because the session is loaded
+        return SECart(request.session).version
+
+
+def render_state(cart: SECart) -> dict:
+    """Render the cart state and cache it by the cart version."""
+    state = {
+        'header': render_to_string(HEADER_TEMPLATE, {'cart': cart}),
+        'total_price': cart.total_price,
+        'total_quantity': cart.total_quantity,
+    }
+    cache.set(STATE_KEY.format(cart.version), state, STATE_TIMEOUT)
+    return state
+
+
+def get_state(request) -> dict:
+    """Return the rendered header cart and the cart totals."""
+    # the response depends on the cookie now. See `CartVersionMiddleware`
+    request._cart_version_used = True
+    version = get_version(request)
+    state = cache.get(STATE_KEY.format(version))
+    if state is not None:
+        return state
+    # the empty cart doesn't need the session
+    session = {} if version == EMPTY_VERSION else request.session
+    return render_state(SECart(session))
+
+
+def set_version(request, response):
+    """
+    Sync the version cookie with the session's cart.
+
+    Call it after the session is saved, so the new session has the key already.
+    """
+    session_key = request.session.session_key
+    if not session_key:
+        # flushed, expired and never saved sessions have the empty cart
+        if VERSION_COOKIE in request.COOKIES:
+            response.delete_cookie(VERSION_COOKIE)
+        return
+    # the empty cart has the cookie too, so the session is not loaded to find it out
+    value = get_signer(session_key).sign(SECart(request.session).version)
+    if value != request.COOKIES.get(VERSION_COOKIE):
+        response.set_cookie(
+            VERSION_COOKIE, value,
+            max_age=settings.SESSION_COOKIE_AGE, httponly=True,
+        )
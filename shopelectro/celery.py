@@ -71,6 +71,16 @@ task_routes = {
         'routing_key': 'utils.mail',
         'priority': 50,
     },
+    'shopelectro.tasks.send_mail': {
+        'queue': 'mail',
+        'routing_key': 'utils.mail',
+        'priority': 50,
+    },
+    'shopelectro.tasks.send_orders_batch': {
+        'queue': 'mail',
+        'routing_key': 'utils.mail',
+        'priority': 50,
+    },
 }
 
 # Using a string here means the worker don't have to serialize
@@ -1,4 +1,7 @@
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from shopelectro import cart as se_cart
 
 
 def shop(request):
@@ -16,3 +19,15 @@ def shop(request):
         'SENTRY_FRONT_DSN': settings.SENTRY_FRONT_DSN,
         'WORKING_HOURS': settings.WORKING_HOURS,
     }
+
+
+def cart(request):
+    """
+    Inject the cart and its cached state into the templates context.
+
+    Most of pages need only the state, so the cart loads the session lazily.
+    """
+    return {
+        'cart': SimpleLazyObject(lambda: se_cart.SECart(request.session)),
+        'cart_state': SimpleLazyObject(lambda: se_cart.get_state(request)),
+    }
@@ -0,0 +1,80 @@
+"""
+Fast user agent classification.
+
+`user_agents.parse` runs a lot of regexes over the user agent string.
+Real traffic contains a few hundreds of distinct user agents,
+so parsed agents are memoized in the process memory with a bounded LRU.
+"""
+import hashlib
+import threading
+import typing
+from collections import OrderedDict
+
+from django.conf import settings
+from user_agents import parse
+from user_agents.parsers import UserAgent
+
+
+class UserAgentCache:
+    """Bounded LRU of parsed user agents, keyed by a user agent string hash."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._parsed: typing.Dict[bytes, UserAgent] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(ua_string: str) -> bytes:
+        return hashlib.md5(ua_string.encode('utf-8')).digest()
+
+    def get(self, ua_string: str) -> UserAgent:
+        key = self.key(ua_string)
+        with self._lock:
+            if key in self._parsed:
+                self._parsed.move_to_end(key)
+                self.hits += 1
+                return self._parsed[key]
+
+        user_agent = parse(ua_string)
+        with self._lock:
+            self.misses += 1
+            self._parsed[key] = user_agent
+            if len(self._parsed) > self.maxsize:
+                self._parsed.popitem(last=False)
+        return user_agent
+
+    def info(self) -> typing.Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._parsed),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._parsed.clear()
+            self.hits = self.misses = 0
+
+
+user_agents = UserAgentCache(maxsize=settings.USER_AGENTS_LRU_SIZE)
+
+
+def get_user_agent(request) -> UserAgent:
+    """The same as `django_user_agents.utils.get_user_agent`, but memoized."""
+    if not hasattr(request, '_parsed_user_agent'):
+        request._parsed_user_agent = user_agents.get(
+            request.META.get('HTTP_USER_AGENT', '')
+        )
+    return request._parsed_user_agent
+
+
+def is_mobile(request) -> bool:
+    return get_user_agent(request).is_mobile
+
+
+def device_class(request) -> str:
+    """Cheap device bucket for the page cache key."""
+    return 'mobile' if is_mobile(request) else 'desktop'
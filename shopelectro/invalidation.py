@@ -0,0 +1,205 @@
+"""
+Dependency tracking invalidation for the page cache.
+
+Cached pages declare catalog entities they depend on: categories and products.
+The page cache middleware registers page cache keys by their dependencies.
+Catalog changes purge only the pages, that depend on the changed entities.
+
+Some changes affect every page, because every page renders the header menu.
+Such changes start the new pages generation, that is a part of the page cache key.
+
+Shared in-memory caches, such as the header menu, are invalidated the same way:
+after the commit and once per the deferred block.
+"""
+import threading
+import typing
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import chain
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from shopelectro import models
+
+DEPENDENCY_KEY = 'cache_dependency:{}'
+# Registry should live not shorter than the longest cached page.
+DEPENDENCY_TIMEOUT = int(timedelta(days=60).total_seconds())
+GENERATION_KEY = 'pages_generation'
+
+SITEMAP = 'sitemap'
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def category(slug: str) -> str:
+    return f'category:{slug}'
+
+
+def product(id_: int) -> str:
+    return f'product:{id_}'
+
+
+def depend(request, *dependencies: str):
+    """Declare entities, the response for the request depends on."""
+    if not hasattr(request, '_cache_dependencies'):
+        request._cache_dependencies = set()
+    request._cache_dependencies.update(dependencies)
+
+
+def get_dependencies(request) -> typing.Set[str]:
+    return getattr(request, '_cache_dependencies', set())
+
+
+def pages_generation() -> str:
+    return cache.get_or_set(GENERATION_KEY, lambda: uuid4().hex, timeout=None)
+
+
+def _redis():
+    """Raw client of the redis cache. Other cache backends have no client."""
+    get_client = getattr(getattr(cache, 'client', None), 'get_client', None)
+    return get_client(write=True) if get_client else None
+
+
+def register(cache_key: str, dependencies: typing.Iterable[str]):
+    """
+    Remember the cache key for every given dependency.
+
+    Concurrent requests register pages at the same time,
+    so the registry is updated atomically and never loses pages.
+    """
+    keys = [DEPENDENCY_KEY.format(dependency) for dependency in dependencies]
+    if not keys:
+        return
+    redis = _redis()
+    if redis is None:
+        # other backends are process-local, so the process lock is enough
+        with _lock:
+            registered = cache.get_many(keys)
+            cache.set_many(
+                {key: registered.get(key, set()) | {cache_key} for key in keys},
+                DEPENDENCY_TIMEOUT,
+            )
+        return
+    with redis.pipeline() as pipeline:
+        for key in map(cache.make_key, keys):
+            pipeline.sadd(key, cache_key)
+            pipeline.expire(key, DEPENDENCY_TIMEOUT)
+        pipeline.execute()
+
+
+def purge(dependencies: typing.Iterable[str]):
+    """Delete cached pages, that depend on the given entities."""
+    keys = [DEPENDENCY_KEY.format(dependency) for dependency in dependencies]
+    if not keys:
+        return
+    redis = _redis()
+    if redis is None:
+        with _lock:
+            registered = cache.get_many(keys)
+            cache.delete_many(keys)
+        cache.delete_many(list(chain.from_iterable(registered.values())))
+        return
+    # the transaction reads and deletes registries at once,
+    # so pages, registered in between, are not lost
+    with redis.pipeline(transaction=True) as pipeline:
+        for key in map(cache.make_key, keys):
+            pipeline.smembers(key)
+            pipeline.delete(key)
+        results = pipeline.execute()
+    cache_keys = {key.decode() for members in results[::2] for key in members}
+    if cache_keys:
+        cache.delete_many(list(cache_keys))
+
+
+class Changes:
+    """Changed catalog entities. They are resolved to cache dependencies at once."""
+
+    def __init__(self):
+        self.products = set()
+        self.pages = set()
+        self.categories = set()
+        self.sitemap = False
+        self.all_pages = False
+        # `invalidate` functions of the shared in-memory caches, e.g. the header menu
+        self.caches = set()
+
+    def update(
+        self, *, products=(), pages=(), categories=(), sitemap=False, all_pages=False, caches=(),
+    ):
+        self.products.update(products)
+        self.pages.update(pages)
+        self.categories.update(categories)
+        self.sitemap |= sitemap
+        self.all_pages |= all_pages
+        self.caches.update(caches)
+
+    def dependencies(self) -> typing.Set[str]:
+        products = set(self.products)
+        categories = set(self.categories)
+        if products or self.pages:
+            for product_id, category_id in (
+                models.Product.objects
+                .filter(Q(id__in=products) | Q(page_id__in=self.pages))
+                .values_list('id', 'category_id')
+            ):
+                products.add(product_id)
+                categories.add(category_id)
+        categories.discard(None)
+
+        slugs = (
+            models.Category.objects
+            .filter(id__in=categories)
+            .get_ancestors(include_self=True)
+            .values_list('page__slug', flat=True)
+        ) if categories else []
+
+        return {
+            *map(product, products),
+            *map(category, slugs),
+            *([SITEMAP] if self.sitemap else []),
+        }
+
+    def purge(self):
+        # every cache is invalidated once, however many times it was changed
+        for invalidate in self.caches:
+            invalidate()
+        if self.all_pages:
+            cache.set(GENERATION_KEY, uuid4().hex, timeout=None)
+        purge(self.dependencies())
+
+
+def changed(**changes):
+    """
+    Purge pages, that depend on the changed entities.
+
+    Pages are purged after the transaction commit.
+    Otherwise a concurrent request can cache the stale data again.
+    See `Changes.update` for the arguments.
+    """
+    deferred_changes = getattr(_local, 'changes', None)
+    if deferred_changes is not None:
+        deferred_changes.update(**changes)
+        return
+
+    changes_ = Changes()
+    changes_.update(**changes)
+    transaction.on_commit(changes_.purge)
+
+
+@contextmanager
+def deferred():
+    """Collect changes in the block and purge dependent pages once in the end."""
+    if getattr(_local, 'changes', None) is not None:
+        yield
+        return
+
+    _local.changes = Changes()
+    try:
+        yield
+    finally:
+        changes_, _local.changes = _local.changes, None
+        transaction.on_commit(changes_.purge)
@@ -1,3 +1,3 @@
-from . import header
+from . import autocomplete, header, search, search_cache, table_editor
 
-__all__ = ['header']
+__all__ = ['autocomplete', 'header', 'search', 'search_cache', 'table_editor']
@@ -0,0 +1,245 @@
+"""
+Autocomplete of categories, products and pages without the db.
+
+The autocomplete is requested on every keystroke, so names are searched
+in the index, that is held in the process memory. See `Index` for the lookups.
+Catalog changes start the new index version in the django cache.
+Processes check the version once per `Index.VERSION_CHECK_INTERVAL` seconds,
+so the most of keystrokes don't touch the cache at all.
+"""
+import re
+import threading
+import time
+import typing
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from functools import lru_cache, reduce
+from heapq import nsmallest
+from itertools import chain
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from pages import models as pages_models
+from shopelectro import models
+from shopelectro.logic import search_cache
+
+# postgres `pg_trgm` splits text to words the same way
+WORD = re.compile(r'[^\W_]+')
+# shorter prefixes match the most of names
+PREFIX_MIN_LENGTH = 2
+# results of the most popular terms are kept in the process memory
+SEARCH_CACHE_SIZE = 10000
+
+
+class Entry(typing.NamedTuple):
+    type: str
+    name: str
+    url: str
+    price: typing.Optional[float] = None
+    vendor_code: typing.Optional[int] = None
+    id: typing.Optional[int] = None
+
+    def as_dict(self) -> dict:
+        fields = {'type': self.type, 'name': self.name, 'url': self.url}
+        if self.price is not None:
+            fields['price'] = self.price
+        return fields
+
+
+def words(text: str) -> typing.List[str]:
+    return WORD.findall(text.lower().replace('ё', 'е'))
+
+
+def trigrams(text: str) -> typing.Set[str]:
+    """Return trigrams the same way `pg_trgm` does, so similarities are close to the db ones."""
+    return {
+        padded[i:i + 3]
+        for padded in (f'  {word} ' for word in words(text))
+        for i in range(len(padded) - 2)
+    }
+
+
+class Index:
+    """
+    In-memory autocomplete index of categories, products and pages.
+
+    Name words are held in the sorted array, so a prefix lookup is a binary search.
+    Name trigrams are held in the posting lists, so a similarity lookup
+    touches only entries, that share trigrams with the term.
+
+    The index is built once per catalog version and held in the process memory.
+    Call `Index.invalidate` to drop it, when the catalog is changed.
+    Other processes rebuild it in `VERSION_CHECK_INTERVAL` seconds at most.
+    """
+
+    TYPES = ['category', 'product', 'pages']
+    VERSION_CACHE_KEY = 'autocomplete_index_version'
+    VERSION_CHECK_INTERVAL = 10  # in seconds
+
+    # process-wide snapshot: (version, index)
+    _snapshot: typing.Tuple[str, typing.Optional['Index']] = ('', None)
+    _checked_at = float('-inf')
+    _lock = threading.Lock()
+
+    def __init__(self, entries: typing.List[Entry]):
+        self.entries = entries
+        self.vendor_codes = {
+            entry.vendor_code: id_
+            for id_, entry in enumerate(entries)
+            if entry.vendor_code is not None
+        }
+
+        self.trigrams_counts = []
+        postings = defaultdict(list)
+        words_ = []
+        for id_, entry in enumerate(entries):
+            entry_trigrams = trigrams(entry.name)
+            self.trigrams_counts.append(len(entry_trigrams))
+            for trigram in entry_trigrams:
+                postings[trigram].append(id_)
+            words_.extend((word, id_) for word in set(words(entry.name)))
+        self.postings = dict(postings)
+
+        words_.sort()
+        self.words = [word for word, _ in words_]
+        self.word_ids = [id_ for _, id_ in words_]
+        # the cache lives as long as the index, so it's never stale
+        self._cached_search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search_normalized)
+
+    @classmethod
+    def build(cls) -> 'Index':
+        """Build the index with three queries: categories, products and pages."""
+        categories = (
+            models.Category.objects
+            .filter(page__is_active=True)
+            .values_list('id', 'name', 'page__slug')
+        )
+        products = (
+            models.Product.objects.active()
+            .values_list('id', 'name', 'vendor_code', 'price')
+        )
+        pages = (
+            pages_models.Page.objects
+            .filter(is_active=True)
+            .exclude(type=pages_models.Page.MODEL_TYPE)
+        )
+        return cls([
+            *(
+                Entry('category', name, reverse('category', args=(slug,)), id=id_)
+                for id_, name, slug in categories.iterator()
+            ),
+            *(
+                Entry(
+                    'product', name, reverse('product', args=(vendor_code,)),
+                    price=price, vendor_code=vendor_code, id=id_,
+                )
+                for id_, name, vendor_code, price in products.iterator()
+            ),
+            *(Entry('pages', page.name, page.url, id=page.id) for page in pages),
+        ])
+
+    @classmethod
+    def invalidate(cls):
+        """Start the new index version. Every process will rebuild the index."""
+        cache.set(cls.VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+        # the current process doesn't wait for the next check
+        cls._checked_at = float('-inf')
+
+    @classmethod
+    def get(cls) -> 'Index':
+        """Return the index of the current catalog version."""
+        snapshot_version, index = cls._snapshot
+        now = time.monotonic()
+        if index is not None and now - cls._checked_at < cls.VERSION_CHECK_INTERVAL:
+            return index
+
+        version = cache.get_or_set(cls.VERSION_CACHE_KEY, lambda: uuid4().hex, timeout=None)
+        cls._checked_at = now
+        if snapshot_version == version:
+            return index
+        # concurrent threads of the process wait for the single build
+        with cls._lock:
+            snapshot_version, index = cls._snapshot
+            if snapshot_version != version:
+                index = cls.build()
+                cls._snapshot = (version, index)
+        return index
+
+    def prefixed(self, word: str) -> typing.Set[int]:
+        """Return entries with a name word, that starts with the given one."""
+        start = bisect_left(self.words, word)
+        # the last unicode char is greater, than any char of words
+        end = bisect_left(self.words, word + '\U0010ffff', lo=start)
+        return set(self.word_ids[start:end])
+
+    def similarities(self, term: str) -> typing.Dict[int, float]:
+        """Return `pg_trgm` similarities of entries, that share trigrams with the term."""
+        term_trigrams = trigrams(term)
+        shared = Counter(chain.from_iterable(
+            self.postings.get(trigram, ()) for trigram in term_trigrams
+        ))
+        return {
+            id_: count / (len(term_trigrams) + self.trigrams_counts[id_] - count)
+            for id_, count in shared.items()
+        }
+
+    def _search_normalized(self, term: str, limit: int) -> typing.List[Entry]:
+        return search_cache.search_normalized(term, lambda term_: self.search(term_, limit))
+
+    def cached_search(self, term: str, limit: int) -> typing.List[Entry]:
+        """Search the normalized term with the process-local results cache."""
+        return self._cached_search(search_cache.normalize(term), limit)
+
+    def search(
+        self, term: str, limit: int, types: typing.Iterable[str] = TYPES,
+    ) -> typing.List[Entry]:
+        """
+        Return the top entries of every given type.
+
+        Exact vendor code goes first, then names with all the term words prefixes,
+        then names similar to the term. Higher similarity goes first in every group.
+        """
+        term_words = [word for word in words(term) if len(word) >= PREFIX_MIN_LENGTH]
+        similarities = self.similarities(term)
+        prefixed = reduce(set.intersection, map(self.prefixed, term_words)) if term_words else set()
+        exact = set()
+        if term.strip().isdecimal() and int(term) in self.vendor_codes:
+            exact.add(self.vendor_codes[int(term)])
+
+        found = exact | prefixed | {
+            id_ for id_, similarity in similarities.items()
+            if similarity >= settings.TRIGRAM_MIN_SIMILARITY
+        }
+        by_type = defaultdict(list)
+        for id_ in found:
+            by_type[self.entries[id_].type].append(id_)
+
+        def rank(id_):
+            return id_ not in exact, id_ not in prefixed, -similarities.get(id_, 0), id_
+
+        return [
+            self.entries[id_]
+            for type_ in types
+            for id_ in nsmallest(limit, by_type[type_], key=rank)
+        ]
+
+
+class AdminSearch(search_cache.CachedSearch):
+    """
+    Admin search entity, that finds objects in the index instead of the similarity scan.
+
+    Editors type the same prefixes again and again, so found ids are cached too.
+    """
+
+    def __init__(self, entity, qs, type_: str):
+        super().__init__(entity, qs, key=f'admin:{type_}')
+        self.type = type_
+
+    def search_ids(self, term: str) -> typing.List[int]:
+        return [
+            entry.id for entry
+            in Index.get().search(term, search_cache.RESULTS_LIMIT, types=[self.type])
+        ]
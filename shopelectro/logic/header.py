@@ -1,16 +1,35 @@
 import typing
-from functools import lru_cache
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
+from django.utils.functional import cached_property
 
 from pages import models as pages_models
 from shopelectro import models
 
 
 class Menu:
+    """
+    Header menu with categories tree.
+
+    The menu is built once per catalog version and shared between requests.
+    Built menu is held in the process memory and in the django cache.
+    Call `Menu.invalidate` to drop it, when category pages are changed.
+    """
+
     DICT_TYPE = typing.Dict[models.CategoryPage, typing.List[models.CategoryPage]]
 
+    CACHE_KEY = 'header_menu:{version}'
+    VERSION_CACHE_KEY = 'header_menu_version'
+    CACHE_TIMEOUT = int(timedelta(days=1).total_seconds())
+
+    # process-wide snapshot: (version, menu)
+    _snapshot: typing.Tuple[str, DICT_TYPE] = ('', {})
+
     @staticmethod
     def roots() -> pages_models.PageQuerySet:  # Ignore PyDocStyleBear
         """
@@ -24,10 +43,8 @@ class Menu:
             .filter(
                 Q(slug__in=settings.HEADER_LINKS['add'])
                 | (
-                    # @todo #974:30m  Optimize the header menu query.
-                    #  Fetch catalog page for the header menu at the same query.
-                    #  root category pages.
-                    Q(parent=pages_models.CustomPage.objects.filter(slug='catalog'))
+                    Q(parent__slug='catalog')
+                    & Q(parent__type=pages_models.Page.CUSTOM_TYPE)
                     & Q(type='model')
                     & Q(related_model_name=models.Category._meta.db_table)
                     & ~Q(slug__in=settings.HEADER_LINKS['exclude'])
@@ -36,14 +53,42 @@ class Menu:
             .order_by('position')
         )
 
-    @lru_cache(maxsize=1)
+    @classmethod
+    def invalidate(cls):
+        """Start the new menu version. Every process will rebuild the menu."""
+        cache.set(cls.VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+    @cached_property
+    def version(self) -> str:
+        return cache.get_or_set(
+            self.VERSION_CACHE_KEY, lambda: uuid4().hex, timeout=None,
+        )
+
+    def build(self) -> DICT_TYPE:
+        """Build menu with two queries: roots and all their children."""
+        roots = list(self.roots())
+        children = defaultdict(list)
+        for child in (
+            pages_models.Page.objects
+            .filter(parent__in=roots)
+            .filter(type='model')
+            .filter(related_model_name=models.Category._meta.db_table)
+            .order_by('name')
+        ):
+            children[child.parent_id].append(child)
+
+        return {root: children[root.id] for root in roots}
+
     def as_dict(self) -> DICT_TYPE:
-        return {
-            root: list(
-                root.get_children()
-                .filter(type='model')
-                .filter(related_model_name=models.Category._meta.db_table)
-                .order_by('name')
-            )
-            for root in self.roots().iterator()
-        }
+        version, menu = Menu._snapshot
+        if version == self.version:
+            return menu
+
+        key = self.CACHE_KEY.format(version=self.version)
+        menu = cache.get(key)
+        if menu is None:
+            menu = self.build()
+            cache.set(key, menu, self.CACHE_TIMEOUT)
+
+        Menu._snapshot = (self.version, menu)
+        return menu
@@ -0,0 +1,113 @@
+"""
+Full-text search documents of categories, products and other pages.
+
+Every page has the weighted document: name and vendor code are the most
+important parts, then product tags, then the page content.
+Documents are stored in the GIN-indexed column of `models.SearchDocument`,
+so the search is an index lookup instead of the similarity scan of all names.
+
+Signals update documents of the changed pages after the transaction commit.
+The catalog import collects changes and updates documents once in the end.
+"""
+import threading
+import typing
+from contextlib import contextmanager
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F, QuerySet
+
+from pages import models as pages_models
+from search import search as search_engine
+from shopelectro import models
+from shopelectro.logic import search_cache
+
+CONFIG = 'russian'
+
+_local = threading.local()
+
+
+def update(pages: typing.Optional[typing.Iterable[int]] = None):
+    """Update documents of the given pages or of all pages."""
+    if pages is not None:
+        pages = list(pages)
+        if not pages:
+            return
+
+    def table(model):
+        return model._meta.db_table
+
+    tags_through = models.Product.tags.through
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table(models.SearchDocument)} (page_id, document)
+            SELECT
+                page.id,
+                setweight(to_tsvector(%(config)s::regconfig, coalesce(page.name, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(product.vendor_code::text, '')), 'A')
+                || setweight(to_tsvector(
+                    %(config)s::regconfig, coalesce(string_agg(tag.name, ' '), '')
+                ), 'B')
+                || setweight(to_tsvector(
+                    %(config)s::regconfig,
+                    regexp_replace(coalesce(page.content, ''), '<[^>]+>', ' ', 'g')
+                ), 'C')
+            FROM {table(pages_models.Page)} page
+            LEFT JOIN {table(models.Product)} product ON product.page_id = page.id
+            LEFT JOIN {table(tags_through)} product_tag ON product_tag.product_id = product.id
+            LEFT JOIN {table(models.Tag)} tag ON tag.id = product_tag.tag_id
+            WHERE %(all)s OR page.id = ANY(%(pages)s::int[])
+            GROUP BY page.id, product.vendor_code
+            ON CONFLICT (page_id) DO UPDATE SET document = EXCLUDED.document
+            """,
+            {'config': CONFIG, 'all': pages is None, 'pages': pages or []},
+        )
+    # cached results were found with the old documents
+    search_cache.invalidate()
+
+
+def _update_on_commit(pages: typing.Set[int]):
+    transaction.on_commit(lambda: update(pages))
+
+
+def changed(pages: typing.Iterable[int]):
+    """Update documents of the changed pages after the transaction commit."""
+    deferred_pages = getattr(_local, 'pages', None)
+    if deferred_pages is not None:
+        deferred_pages.update(pages)
+    else:
+        _update_on_commit(set(pages))
+
+
+@contextmanager
+def deferred():
+    """Collect changed pages in the block and update their documents once in the end."""
+    if getattr(_local, 'pages', None) is not None:
+        yield
+        return
+
+    _local.pages = set()
+    try:
+        yield
+    finally:
+        pages, _local.pages = _local.pages, None
+        _update_on_commit(pages)
+
+
+class Search(search_engine.Search):
+    """Full-text search entity with the same interface, as the trigram one has."""
+
+    def __init__(self, *args, qs: QuerySet, document_field: str, **kwargs):
+        super().__init__(*args, qs=qs, **kwargs)
+        self.queryset = qs
+        self.document_field = document_field
+
+    def search(self, term: str) -> QuerySet:
+        query = SearchQuery(term, config=CONFIG)
+        return (
+            self.queryset
+            .filter(**{self.document_field: query})
+            .annotate(rank=SearchRank(F(self.document_field), query))
+            .order_by('-rank')
+        )
@@ -0,0 +1,121 @@
+"""
+Cache of search results.
+
+Popular queries are searched thousands times a day with the same results.
+So results are cached by the normalized query and the searched entity:
+case, extra whitespaces and `ё` don't change the cache key.
+The query without results is searched once more with the switched keyboard layout,
+so `fkrfkby` finds the same, as `алкалин` does.
+
+Results are cached for `CACHE_TIMEOUT` at most.
+The autocomplete index is faster, than the cache, so it caches results
+in the process memory instead. See `autocomplete.Index.cached_search`.
+Catalog changes start the new results version, so stale results are not served.
+"""
+import hashlib
+import typing
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, QuerySet, When
+
+from search import search as search_engine
+
+VERSION_CACHE_KEY = 'search_results_version'
+CACHE_KEY = 'search_results:{version}:{digest}'
+CACHE_TIMEOUT = int(timedelta(hours=1).total_seconds())
+# search page shows less results of an entity
+RESULTS_LIMIT = 100
+
+LATIN_LAYOUT = "`qwertyuiop[]asdfghjkl;'zxcvbnm,."
+CYRILLIC_LAYOUT = 'ёйцукенгшщзхъфывапролджэячсмитьбю'
+TO_CYRILLIC = str.maketrans(LATIN_LAYOUT, CYRILLIC_LAYOUT)
+TO_LATIN = str.maketrans(CYRILLIC_LAYOUT, LATIN_LAYOUT)
+
+T = typing.TypeVar('T')
+
+
+def normalize(term: str) -> str:
+    return ' '.join(term.lower().replace('ё', 'е').split())
+
+
+def switch_layout(term: str) -> str:
+    """Retype the term with the other keyboard layout."""
+    term = term.lower()
+    is_cyrillic = any(char in CYRILLIC_LAYOUT for char in term)
+    return normalize(term.translate(TO_LATIN if is_cyrillic else TO_CYRILLIC))
+
+
+def invalidate():
+    """Start the new results version. Cached results are not served anymore."""
+    cache.set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+
+def get_key(entity: str, term: str) -> str:
+    version = cache.get_or_set(VERSION_CACHE_KEY, lambda: uuid4().hex, timeout=None)
+    # the term may be too long or contain chars, that are not allowed in keys
+    digest = hashlib.md5(f'{entity}:{term}'.encode()).hexdigest()
+    return CACHE_KEY.format(version=version, digest=digest)
+
+
+def search_normalized(term: str, search: typing.Callable[[str], T]) -> T:
+    """Search the normalized term. Search the switched layout term, if results are empty."""
+    term = normalize(term)
+    results = search(term)
+    switched = switch_layout(term)
+    if not results and switched != term:
+        results = search(switched)
+    return results
+
+
+def get_or_search(entity: str, term: str, search: typing.Callable[[str], T]) -> T:
+    """
+    Return cached results of the entity search for the term.
+
+    `search` is called with the normalized term on the cache miss.
+    Empty results are falsy, so the switched layout term is searched after them.
+    """
+    term = normalize(term)
+    key = get_key(entity, term)
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    results = search_normalized(term, search)
+    cache.set(key, results, CACHE_TIMEOUT)
+    return results
+
+
+class CachedSearch:
+    """
+    Search entity, that caches ids of the found objects.
+
+    The cached search is the primary key lookup instead of the similarity scan.
+    Other attributes are taken from the wrapped entity.
+    """
+
+    def __init__(self, entity: search_engine.Search, qs: QuerySet, key: str):
+        self.entity = entity
+        self.queryset = qs
+        # distinguishes entities with the same name and different search methods
+        self.key = key
+
+    def __getattr__(self, name):
+        return getattr(self.entity, name)
+
+    def search_ids(self, term: str) -> typing.List[int]:
+        return list(self.entity.search(term).values_list('pk', flat=True)[:RESULTS_LIMIT])
+
+    def search(self, term: str) -> QuerySet:
+        ids = get_or_search(self.key, term, self.search_ids)
+        if not ids:
+            return self.queryset.none()
+        return (
+            self.queryset
+            .filter(pk__in=ids)
+            .order_by(Case(
+                *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+                output_field=IntegerField(),
+            ))
+        )
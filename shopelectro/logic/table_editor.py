@@ -0,0 +1,250 @@
+"""
+Feed and bulk edits of the table editor rows.
+
+The feed returns a page of rows with the requested columns only.
+Columns are fetched with `values`, so model instances are not built at all.
+The full export is streamed row by row from the db cursor.
+
+Editors paste changes of hundreds of rows at once. Patches of all the rows are
+applied in one transaction: products and pages are fetched and locked,
+categories are resolved by names with one query, and changed fields
+are written with one UPDATE per model. Every row is written with its own
+changed fields only, so concurrent edits of other fields are kept.
+Rows, that the patch doesn't change, are not written at all.
+
+Bulk updates skip model signals, so dependent caches are invalidated here.
+"""
+import typing
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Model, QuerySet, Value, When
+from django.utils import timezone
+
+from pages import models as pages_models
+from shopelectro import invalidation, models
+from shopelectro.logic import autocomplete, search, search_cache
+
+CATEGORY_NAME = 'category_name'
+PAGE_PREFIX = 'page_'
+
+Row = typing.Dict[str, typing.Any]
+
+
+def get_id(row: Row) -> typing.Optional[int]:
+    try:
+        return int(row.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def changed_values(instance: Model, values: Row) -> Row:
+    """Return values, that differ from the instance ones. Foreign keys take ids."""
+    return {
+        name: value for name, value in values.items()
+        if getattr(instance, instance._meta.get_field(name).attname) != value
+    }
+
+
+def bulk_update(model: typing.Type[Model], changes: typing.Dict[int, typing.Dict[str, typing.Any]]):
+    """
+    Write changes of the rows with one query. Django 1.11 has no `bulk_update`.
+
+    `changes` maps primary keys to the changed fields values. Foreign keys take ids.
+    A field is written only to the rows, that changed it.
+    """
+    fields = {name for values in changes.values() for name in values}
+    if not fields:
+        return
+
+    def value(name: str):
+        field = model._meta.get_field(name)
+        return Case(
+            *(
+                When(pk=pk, then=Value(values[name], output_field=field))
+                for pk, values in changes.items() if name in values
+            ),
+            default=F(name),
+            output_field=field,
+        )
+
+    model.objects.filter(pk__in=list(changes)).update(**{name: value(name) for name in fields})
+
+
+class Table:
+    """
+    Editable columns of the table editor.
+
+    Columns are product fields, `category_name` and page fields with `page_` prefix.
+    """
+
+    def __init__(self, product_fields: typing.Iterable[str], page_fields: typing.Iterable[str]):
+        self.product_fields = set(product_fields)
+        self.page_fields = set(page_fields)
+
+    @property
+    def lookups(self) -> typing.Dict[str, str]:
+        """Map columns to the product queryset lookups."""
+        return {
+            'id': 'id',
+            CATEGORY_NAME: 'category__name',
+            **{name: name for name in self.product_fields},
+            **{PAGE_PREFIX + name: f'page__{name}' for name in self.page_fields},
+        }
+
+
+class Feed(Table):
+    """Rows of the table editor with the requested columns only."""
+
+    def get_rows(
+        self,
+        columns: typing.Iterable[str],
+        filters: typing.Dict[str, str] = None,
+        term: str = '',
+        sort: str = 'id',
+    ) -> QuerySet:
+        """
+        Return dicts with the columns of filtered and sorted rows.
+
+        `filters` are exact values of the columns, `term` is a part of the product name.
+        Raise `ValidationError` on unknown columns.
+        """
+        lookups = self.lookups
+        unknown = {*columns, *(filters or {}), sort.lstrip('-')} - set(lookups)
+        if unknown:
+            raise ValidationError(f'Unknown columns: {", ".join(sorted(unknown))}.')
+
+        rows = (
+            models.Product.objects
+            .filter(**{lookups[column]: value for column, value in (filters or {}).items()})
+            # related columns are aliased, model fields can't be aliased with their names
+            .values(
+                *{'id', *(column for column in columns if lookups[column] == column)},
+                **{
+                    column: F(lookups[column])
+                    for column in columns if lookups[column] != column
+                },
+            )
+        )
+        if term:
+            rows = rows.filter(name__icontains=term)
+        order = ('-' if sort.startswith('-') else '') + lookups[sort.lstrip('-')]
+        # the id makes the order stable between pages
+        return rows.order_by(order, 'id')
+
+
+class Patches(Table):
+    """Apply patches of the table editor rows. Every patch contains the product id."""
+
+    def clean(self, row: Row, product: models.Product, categories: dict):
+        """Return cleaned product and page values of the row and errors."""
+        product_values, page_values, errors = {}, {}, {}
+        for key, value in row.items():
+            if key == 'id':
+                continue
+            try:
+                if key == CATEGORY_NAME:
+                    if not isinstance(value, str) or value not in categories:
+                        raise ValidationError(f'Category with name={value} does not exist.')
+                    product_values['category'] = categories[value]
+                elif key in self.product_fields:
+                    field = models.Product._meta.get_field(key)
+                    product_values[key] = field.clean(value, product)
+                    # product and page names are the same
+                    if key == 'name' and product.page_id:
+                        page_values['name'] = product_values[key]
+                elif key.startswith(PAGE_PREFIX) and key[len(PAGE_PREFIX):] in self.page_fields:
+                    if not product.page_id:
+                        raise ValidationError('Product has no page.')
+                    name = key[len(PAGE_PREFIX):]
+                    field = pages_models.Page._meta.get_field(name)
+                    page_values[name] = field.clean(value, product.page)
+                else:
+                    raise ValidationError('Field is not editable.')
+            except ValidationError as error:
+                errors[key] = error.messages
+        return product_values, page_values, errors
+
+    def apply(self, rows: typing.List[Row]) -> typing.List[dict]:
+        """Apply the patches and return the result of every row."""
+        categories = {
+            category.name: category
+            for category in models.Category.objects.filter(name__in={
+                row[CATEGORY_NAME] for row in rows if isinstance(row.get(CATEGORY_NAME), str)
+            })
+        }
+
+        with transaction.atomic():
+            # locked rows are not changed by others until the patches are written
+            # pages are locked separately, because postgres doesn't lock outer joins
+            products = (
+                models.Product.objects
+                .select_for_update()
+                .in_bulk(list(filter(None, map(get_id, rows))))
+            )
+            pages = pages_models.Page.objects.select_for_update().in_bulk(
+                [product.page_id for product in products.values() if product.page_id]
+            )
+            for product in products.values():
+                if product.page_id:
+                    product.page = pages[product.page_id]
+            results = []
+            product_changes, page_changes = defaultdict(dict), defaultdict(dict)
+            categories_ids = set()
+            for row in rows:
+                product = products.get(get_id(row))
+                if not product:
+                    results.append({
+                        'id': row.get('id'), 'ok': False,
+                        'errors': {'id': ['Product does not exist.']},
+                    })
+                    continue
+
+                product_values, page_values, errors = self.clean(row, product, categories)
+                if errors:
+                    results.append({'id': product.id, 'ok': False, 'errors': errors})
+                    continue
+
+                results.append({'id': product.id, 'ok': True})
+                if 'category' in product_values:
+                    product_values['category'] = product_values['category'].id
+                product_values = changed_values(product, product_values)
+                page_values = changed_values(product.page, page_values) if page_values else {}
+                if not (product_values or page_values):
+                    continue
+
+                categories_ids.add(product.category_id)
+                categories_ids.add(product_values.get('category', product.category_id))
+                # the sitemap shows the product as modified
+                product_changes[product.id].update(product_values, date_updated=timezone.now())
+                if page_values:
+                    page_changes[product.page_id].update(page_values)
+
+            bulk_update(models.Product, product_changes)
+            bulk_update(pages_models.Page, page_changes)
+            transaction.on_commit(lambda: self.invalidate(
+                products=[products[id_] for id_ in product_changes],
+                pages=list(page_changes),
+                categories=categories_ids,
+            ))
+        return results
+
+    @staticmethod
+    def invalidate(
+        products: typing.List[models.Product],
+        pages: typing.List[int],
+        categories: typing.Set[int],
+    ):
+        """Do the work of the skipped model signals."""
+        if not products:
+            return
+        invalidation.changed(
+            products=[product.id for product in products],
+            categories=categories,
+            pages=pages,
+            sitemap=bool(pages),
+        )
+        search.changed(pages=[product.page_id for product in products])
+        autocomplete.Index.invalidate()
+        search_cache.invalidate()
@@ -0,0 +1,174 @@
+"""
+Email backend, that moves SMTP off the request path.
+
+Checkout and call-back views send emails with `ecommerce.mailer`.
+The backend puts every message to the celery mail queue and returns at once.
+The mail worker sends messages with `settings.QUEUED_EMAIL_BACKEND`
+and retries on SMTP errors. Every message gets the idempotency key,
+so a redelivered or retried task never sends the message twice.
+
+Emails of many orders, selected in the admin, are sent by the single batch task
+with one SMTP connection. The order template is loaded once per batch,
+every order only renders it. The task reports its progress to the cache.
+"""
+import base64
+import logging
+import smtplib
+import typing
+from datetime import timedelta
+from email.mime.base import MIMEBase
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.template.loader import get_template
+
+from shopelectro import models
+
+logger = logging.getLogger(__name__)
+
+SENT_KEY = 'sent_mail:{}'
+# Keys should outlive the task retries.
+SENT_TIMEOUT = int(timedelta(days=7).total_seconds())
+BATCH_KEY = 'mail_batch:{}'
+BATCH_ORDER_KEY = 'mail_batch:{}:order:{}'
+BATCH_TIMEOUT = int(timedelta(days=1).total_seconds())
+ORDER_TEMPLATE = 'ecommerce/order/email.html'
+
+
+def serialize_attachment(attachment) -> dict:
+    if isinstance(attachment, MIMEBase):
+        raise ValueError('MIME attachments can\'t be queued. Attach the file content instead.')
+    filename, content, mimetype = attachment
+    is_text = isinstance(content, str)
+    return {
+        'filename': filename,
+        'content': base64.b64encode(content.encode() if is_text else content).decode(),
+        'mimetype': mimetype,
+        'is_text': is_text,
+    }
+
+
+def deserialize_attachment(data: dict) -> tuple:
+    content = base64.b64decode(data['content'])
+    return data['filename'], content.decode() if data['is_text'] else content, data['mimetype']
+
+
+def serialize(message: EmailMessage) -> dict:
+    """Json-serializable message for the celery task."""
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'attachments': list(map(serialize_attachment, message.attachments)),
+        'alternatives': getattr(message, 'alternatives', []),
+        'content_subtype': message.content_subtype,
+    }
+
+
+def deserialize(data: dict, connection=None) -> EmailMultiAlternatives:
+    data = dict(data)
+    content_subtype = data.pop('content_subtype')
+    data['attachments'] = list(map(deserialize_attachment, data['attachments']))
+    message = EmailMultiAlternatives(**data, connection=connection)
+    message.content_subtype = content_subtype
+    return message
+
+
+def send(idempotency_key: str, data: dict):
+    """Send the serialized message once per the idempotency key."""
+    sent_key = SENT_KEY.format(idempotency_key)
+    # the key is claimed before sending, so concurrent deliveries don't send it twice
+    if not cache.add(sent_key, True, SENT_TIMEOUT):
+        return
+    try:
+        with get_connection(settings.QUEUED_EMAIL_BACKEND) as connection:
+            deserialize(data, connection).send()
+    except Exception:
+        # the retry sends the message again
+        cache.delete(sent_key)
+        raise
+
+
+class QueueEmailBackend(BaseEmailBackend):
+    """Put messages to the mail queue. Messages are sent inline without celery."""
+
+    def send_messages(self, email_messages: typing.List[EmailMessage]) -> int:
+        from shopelectro import tasks  # tasks module imports this one
+
+        for message in email_messages:
+            args = (uuid4().hex, serialize(message))
+            if getattr(settings, 'USE_CELERY', True):
+                tasks.send_mail.delay(*args)
+            else:
+                tasks.send_mail(*args)
+        return len(email_messages)
+
+
+def order_messages(order: models.Order, template) -> typing.List[EmailMessage]:
+    """Emails of the placed order to the shop and the customer, as `mailer.send_order` sends."""
+    subject = settings.EMAIL_SUBJECTS['order' if order.email else 'one_click'].format(order)
+    body = template.render({'order': order, 'shop': settings.SHOP})
+    recipients = [settings.EMAIL_RECIPIENTS, *([[order.email]] if order.email else [])]
+    messages = [EmailMessage(subject, body, settings.EMAIL_SENDER, to) for to in recipients]
+    for message in messages:
+        message.content_subtype = 'html'
+    return messages
+
+
+def get_batch(job_id: str) -> typing.Optional[dict]:
+    """Return the progress of the batch: total, sent and failed orders."""
+    return cache.get(BATCH_KEY.format(job_id))
+
+
+def _close(connection):
+    """Drop the broken connection. The next order opens the new one."""
+    try:
+        connection.close()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def send_orders_batch(job_id: str, order_ids: typing.List[int]):
+    """Send emails of the orders with one SMTP connection and report the progress."""
+    key = BATCH_KEY.format(job_id)
+    # the redelivered task continues the progress of the first delivery
+    status = cache.get(key) or {'total': len(order_ids), 'sent': 0, 'failed': [], 'done': False}
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND)
+    template = None
+    try:
+        orders = list(models.Order.objects.filter(id__in=order_ids).order_by('id'))
+        status['failed'] = sorted(
+            set(status['failed']) | (set(order_ids) - {order.id for order in orders})
+        )
+        cache.set(key, status, BATCH_TIMEOUT)
+
+        for order in orders:
+            # the claimed order is never sent again by the redelivered task
+            if not cache.add(BATCH_ORDER_KEY.format(job_id, order.id), True, BATCH_TIMEOUT):
+                continue
+            try:
+                # the template is loaded once, every order only renders it
+                template = template or get_template(ORDER_TEMPLATE)
+                messages = order_messages(order, template)
+                # it's no-op for the open connection. `send_messages` would close a new one
+                connection.open()
+                connection.send_messages(messages)
+                status['sent'] += 1
+            except Exception as error:
+                logger.exception(f'Emails of the order {order.id} were not sent: {error}')
+                status['failed'].append(order.id)
+                if isinstance(error, (smtplib.SMTPException, OSError)):
+                    _close(connection)
+            cache.set(key, status, BATCH_TIMEOUT)
+    finally:
+        _close(connection)
+        status['done'] = True
+        cache.set(key, status, BATCH_TIMEOUT)
@@ -0,0 +1,7 @@
+"""Helpers of the benchmarks: `tests_benchmarks` and the `benchmark_load` command."""
+import typing
+
+
+def percentile(values: typing.List[float], percent: int) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
@@ -0,0 +1,147 @@
+"""
+CommerceML catalog files of the arbitrary size for `update_catalog` benchmarks.
+
+Files have the same layout as files on the 1C FTP server,
+so `update_catalog --no-download` handles them the same way as downloaded ones.
+The catalog consists of the db products, that are updated by the import,
+and the new products, that are created by the import.
+"""
+import os
+import random
+import shutil
+import typing
+from uuid import uuid4
+from xml.etree import ElementTree
+
+from django.conf import settings
+
+from shopelectro import models
+
+NAMESPACE = 'urn:1C.ru:commerceml_2'
+# `update_catalog` takes files from the `ASSETS_DIR/*/webdata/*/{goods,properties}/*/`
+DIR = 'commerceml'
+ROOT = os.path.join(DIR, 'webdata', '000000001')
+PACK_TAGS = ['1 шт', '2 в блистере', '4 в стяжке', '10 в коробке']
+
+
+def element(parent: ElementTree.Element, tag: str, text=None) -> ElementTree.Element:
+    child = ElementTree.SubElement(parent, f'{{{NAMESPACE}}}{tag}')
+    if text is not None:
+        child.text = str(text)
+    return child
+
+
+def write(path: str, root: ElementTree.Element):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ElementTree.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+
+
+class Catalog:
+    """Write the db catalog with `new_products` extra products to the 1C files."""
+
+    def __init__(self, new_products: int, seed=0):
+        self.random = random.Random(seed)
+        self.groups = list(
+            models.TagGroup.objects
+            .exclude(uuid=settings.PACK_GROUP_UUID)
+            .prefetch_related('tags')
+        )
+        self.products = [
+            *(
+                (str(product.uuid), product.vendor_code, product.name, product.price)
+                for product in models.Product.objects.iterator()
+            ),
+            *self.new_products(new_products),
+        ]
+
+    def new_products(self, count: int) -> typing.Iterator[tuple]:
+        last_code = models.Product.objects.order_by('-vendor_code').values_list(
+            'vendor_code', flat=True,
+        ).first() or 0
+        for index in range(1, count + 1):
+            yield (
+                str(uuid4()),
+                (last_code + index - 1) % models.VENDOR_CODE_MAX + 1,
+                f'New product #{index}',
+                self.random.randint(10, 10000),
+            )
+
+    def write(self):
+        root = os.path.join(settings.ASSETS_DIR, ROOT)
+        write(os.path.join(root, 'properties', '1', 'import___0.xml'), self.properties())
+        goods = os.path.join(root, 'goods', '1')
+        write(os.path.join(goods, 'import___0.xml'), self.goods())
+        write(os.path.join(goods, 'prices___0.xml'), self.prices())
+        write(os.path.join(goods, 'rests___0.xml'), self.rests())
+
+    @staticmethod
+    def remove():
+        shutil.rmtree(os.path.join(settings.ASSETS_DIR, DIR), ignore_errors=True)
+
+    @staticmethod
+    def root() -> ElementTree.Element:
+        return ElementTree.Element(f'{{{NAMESPACE}}}КоммерческаяИнформация')
+
+    def properties(self) -> ElementTree.Element:
+        root = self.root()
+        properties = element(element(root, 'Классификатор'), 'Свойства')
+        for uuid, name, tags in [
+            *((group.uuid, group.name, group.tags.all()) for group in self.groups),
+            (settings.PACK_GROUP_UUID, settings.PACK_GROUP_NAME, []),
+        ]:
+            property_ = element(properties, 'Свойство')
+            element(property_, 'Ид', uuid)
+            element(property_, 'Наименование', name)
+            values = element(property_, 'ВариантыЗначений')
+            for tag in tags:
+                value = element(values, 'Справочник')
+                element(value, 'ИдЗначения', tag.uuid)
+                element(value, 'Значение', tag.name)
+        return root
+
+    def goods(self) -> ElementTree.Element:
+        root = self.root()
+        goods = element(element(root, 'Каталог'), 'Товары')
+        for uuid, vendor_code, name, _ in self.products:
+            product = element(goods, 'Товар')
+            element(product, 'Ид', uuid)
+            element(product, 'Наименование', name)
+            element(product, 'Описание', f'{name} description.')
+
+            tags = element(product, 'ЗначенияСвойств')
+            for group in self.groups:
+                tag_uuids = [tag.uuid for tag in group.tags.all()]
+                if tag_uuids:
+                    tag = element(tags, 'ЗначенияСвойства')
+                    element(tag, 'Ид', group.uuid)
+                    element(tag, 'Значение', self.random.choice(tag_uuids))
+            # pack tags are referenced by names, as 1C does
+            pack = element(tags, 'ЗначенияСвойства')
+            element(pack, 'Ид', settings.PACK_GROUP_UUID)
+            element(pack, 'Значение', self.random.choice(PACK_TAGS))
+
+            attribute = element(element(product, 'ЗначенияРеквизитов'), 'ЗначениеРеквизита')
+            element(attribute, 'Наименование', 'Код')
+            element(attribute, 'Значение', f'{vendor_code:05}')
+        return root
+
+    def prices(self) -> ElementTree.Element:
+        root = self.root()
+        offers = element(element(root, 'ПакетПредложений'), 'Предложения')
+        for uuid, _, _, price in self.products:
+            offer = element(offers, 'Предложение')
+            element(offer, 'Ид', uuid)
+            prices = element(offer, 'Цены')
+            # purchase, wholesale large, medium, small and retail prices
+            for factor in [0.5, 0.6, 0.7, 0.8, 1]:
+                element(element(prices, 'Цена'), 'ЦенаЗаЕдиницу', round(price * factor, 2))
+        return root
+
+    def rests(self) -> ElementTree.Element:
+        root = self.root()
+        offers = element(element(root, 'ПакетПредложений'), 'Предложения')
+        for uuid, *_ in self.products:
+            offer = element(offers, 'Предложение')
+            element(offer, 'Ид', uuid)
+            element(element(offer, 'Остатки'), 'Количество', self.random.randint(0, 100))
+        return root
@@ -0,0 +1,326 @@
+"""
+Synthetic catalog of the arbitrary size for load and benchmark runs.
+
+The `test_db` fixture is too small to show N+1 queries and facets costs.
+Rows are inserted with bulk operations, the biggest tables are filled with COPY.
+MPTT fields are computed in memory and written once in the end.
+
+Production-sized catalog of ~50k products:
+`python manage.py test_db --synthetic --categories=1000 --products-per-leaf=55`
+"""
+import io
+import logging
+import math
+import os
+import random
+import time
+import typing
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from images.models import Image
+from pages.models import Page
+from shopelectro import models, tests
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+# MPTT fields are computed by `rebuild_tree` in the end.
+TREE_STUB = {'lft': 0, 'rght': 0, 'tree_id': 0, 'level': 0}
+IMAGE = os.path.join(
+    os.path.dirname(os.path.abspath(tests.__file__)), 'assets/deer.jpg'
+)
+
+
+class Size(typing.NamedTuple):
+    categories: int = 100
+    depth: int = 3
+    products_per_leaf: int = 50
+    tag_groups: int = 10
+    tags_per_group: int = 20
+    images: int = 1
+    feedbacks: int = 2
+
+
+@contextmanager
+def stage(name: str):
+    start = time.monotonic()
+    yield
+    logger.info(f'{name} took {time.monotonic() - start:.2f}s.')
+
+
+def copy(table: str, columns: typing.List[str], rows: typing.Iterable[tuple]):
+    """
+    Fill the table with postgres COPY. It's much faster than INSERT.
+
+    Values should not contain tabs, newlines and backslashes.
+    """
+    buffer = io.StringIO()
+    buffer.writelines('\t'.join(map(str, row)) + '\n' for row in rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN', buffer,
+        )
+
+
+def rebuild_tree(model):
+    """
+    The same as `TreeManager.rebuild`, but with the constant number of queries.
+
+    `rebuild` updates every node with the separate query,
+    it takes minutes for the big trees.
+    """
+    opts = model._mptt_meta
+    table = model._meta.db_table
+
+    def column(name: str) -> str:
+        return model._meta.get_field(name).column
+
+    columns = [
+        column(name) for name in
+        [opts.left_attr, opts.right_attr, opts.tree_id_attr, opts.level_attr]
+    ]
+
+    children = defaultdict(list)
+    for pk, parent_id in (
+        model._default_manager
+        .order_by(*opts.order_insertion_by, 'pk')
+        .values_list('pk', column(opts.parent_attr))
+    ):
+        children[parent_id].append(pk)
+
+    def walk(root: int, tree_id: int) -> typing.Iterator[tuple]:
+        lefts = {}
+        counter = 0
+        stack = [(root, 0, False)]
+        while stack:
+            pk, level, is_visited = stack.pop()
+            counter += 1
+            if is_visited:
+                yield pk, lefts.pop(pk), counter, tree_id, level
+                continue
+            lefts[pk] = counter
+            stack.append((pk, level, True))
+            stack.extend((child, level + 1, False) for child in reversed(children[pk]))
+
+    temp_table = f'{table}_tree'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {temp_table} (id integer PRIMARY KEY, '
+            + ', '.join(f'{name} integer' for name in columns) + ')'
+        )
+        copy(temp_table, ['id', *columns], (
+            node
+            for tree_id, root in enumerate(children[None], start=1)
+            for node in walk(root, tree_id)
+        ))
+        cursor.execute(
+            f'UPDATE {table} SET '
+            + ', '.join(f'{name} = {temp_table}.{name}' for name in columns)
+            + f' FROM {temp_table} WHERE {table}.id = {temp_table}.id'
+        )
+        cursor.execute(f'DROP TABLE {temp_table}')
+
+
+class Generator:
+    """Fill the empty db with the catalog of the given size."""
+
+    def __init__(self, size: Size, seed=0):
+        self.size = size
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+
+    def generate(self) -> typing.Dict[str, int]:
+        with transaction.atomic():
+            with stage('Categories creation'):
+                leaves = self.create_categories()
+            with stage('Tags creation'):
+                tags = self.create_tags()
+            with stage('Products creation'):
+                products = self.create_products(leaves)
+            with stage('Products tagging'):
+                self.tag_products(products, tags)
+            with stage('Images creation'):
+                self.create_images(products)
+            with stage('Feedbacks creation'):
+                self.create_feedbacks(products)
+            with stage('MPTT rebuilding'):
+                rebuild_tree(models.Category)
+                rebuild_tree(Page)
+
+        return {
+            'categories': models.Category.objects.count(),
+            'leaves': len(leaves),
+            'products': len(products),
+            'tags': sum(map(len, tags)),
+        }
+
+    def bulk_create_categories(
+        self, parents: typing.List[typing.Optional[models.Category]], start: int,
+    ) -> typing.List[models.Category]:
+        catalog = models.Category.get_default_parent()
+        pages = Page.objects.bulk_create([
+            Page(
+                name=f'Category #{index}',
+                slug=f'category-{index}',
+                type=Page.MODEL_TYPE,
+                related_model_name=models.Category._meta.db_table,
+                parent_id=parent.page_id if parent else catalog.id,
+                **TREE_STUB,
+            )
+            for index, parent in enumerate(parents, start=start)
+        ], BATCH_SIZE)
+        return models.Category.objects.bulk_create([
+            models.Category(name=page.name, page=page, parent=parent, **TREE_STUB)
+            for parent, page in zip(parents, pages)
+        ], BATCH_SIZE)
+
+    def create_categories(self) -> typing.List[models.Category]:
+        """Create the balanced categories tree and return its leaves."""
+        branching = max(1, math.ceil(self.size.categories ** (1 / self.size.depth)))
+        total = 0
+        leaves = []
+        parents = [None]
+        for _ in range(self.size.depth):
+            children_parents = [
+                parent for parent in parents for _ in range(branching)
+            ][:self.size.categories - total]
+            if not children_parents:
+                break
+            children = self.bulk_create_categories(children_parents, start=total + 1)
+            total += len(children)
+
+            if parents == [None]:
+                models.MatrixBlock.objects.bulk_create(
+                    models.MatrixBlock(category=category) for category in children
+                )
+            with_children = {category.parent_id for category in children}
+            leaves.extend(
+                parent for parent in parents
+                if parent and parent.id not in with_children
+            )
+            parents = children
+        return leaves + parents
+
+    def create_tags(self) -> typing.List[typing.List[int]]:
+        """Return tags ids grouped by tag groups."""
+        names = [
+            settings.BRAND_TAG_GROUP_NAME,
+            *(f'Group #{index}' for index in range(1, self.size.tag_groups)),
+        ][:self.size.tag_groups]
+        groups = models.TagGroup.objects.bulk_create(
+            models.TagGroup(name=name, position=position)
+            for position, name in enumerate(names, start=1)
+        )
+
+        def create_tag(group, position):
+            tag = models.Tag(group=group, name=f'Value #{position}', position=position)
+            tag.slug = tag._get_slug()
+            return tag
+
+        tags = models.Tag.objects.bulk_create([
+            create_tag(group, position)
+            for group in groups
+            for position in range(1, self.size.tags_per_group + 1)
+        ], BATCH_SIZE)
+        grouped = defaultdict(list)
+        for tag in tags:
+            grouped[tag.group_id].append(tag.id)
+        return [grouped[group.id] for group in groups]
+
+    def create_products(
+        self, leaves: typing.List[models.Category],
+    ) -> typing.List[models.Product]:
+        parents = [leaf for leaf in leaves for _ in range(self.size.products_per_leaf)]
+        pages = Page.objects.bulk_create([
+            Page(
+                name=f'Product #{index}',
+                slug=f'product-{index}',
+                type=Page.MODEL_TYPE,
+                related_model_name=models.Product._meta.db_table,
+                parent_id=parent.page_id,
+                **TREE_STUB,
+            )
+            for index, parent in enumerate(parents, start=1)
+        ], BATCH_SIZE)
+
+        def create_product(index, page, category):
+            price = self.random.randint(10, 10000)
+            return models.Product(
+                page=page,
+                name=page.name,
+                category=category,
+                # codes of the bigger catalogs are repeated
+                vendor_code=(index - 1) % models.VENDOR_CODE_MAX + 1,
+                price=price,
+                in_stock=self.random.choice([0, 0, 1, 5, 20, 100]),
+                is_popular=index % 100 == 0,
+                wholesale_small=price * 0.75,
+                wholesale_medium=price * 0.5,
+                wholesale_large=price * 0.25,
+            )
+
+        return models.Product.objects.bulk_create([
+            create_product(index, page, category)
+            for index, (page, category) in enumerate(zip(pages, parents), start=1)
+        ], BATCH_SIZE)
+
+    def tag_products(
+        self, products: typing.List[models.Product], tags: typing.List[typing.List[int]],
+    ):
+        """Give a tag of every group to every product. Tags popularity is skewed."""
+        through = models.Product.tags.through
+        columns = [
+            through._meta.get_field('product').column,
+            through._meta.get_field('tag').column,
+        ]
+        weights = list(accumulate(
+            1 / rank for rank in range(1, self.size.tags_per_group + 1)
+        ))
+        copy(through._meta.db_table, columns, (
+            (product.id, tag_id)
+            for product in products
+            for group in tags if group
+            for tag_id in self.random.choices(group, cum_weights=weights)
+        ))
+
+    def create_images(self, products: typing.List[models.Product]):
+        """All the images share the single file, so `Image.save` is not needed."""
+        if not self.size.images:
+            return
+        with open(IMAGE, mode='rb') as file:
+            path = default_storage.save('synthetic/deer.jpg', File(file))
+        content_type = ContentType.objects.get_for_model(Page)
+        Image.objects.bulk_create((
+            Image(
+                content_type=content_type,
+                object_id=product.page_id,
+                slug=f'image-{index}',
+                image=path,
+                is_main=index == 0,
+            )
+            for product in products
+            for index in range(self.size.images)
+        ), BATCH_SIZE)
+
+    def create_feedbacks(self, products: typing.List[models.Product]):
+        opts = models.ProductFeedback._meta
+        fields = ['product', 'date', 'name', 'rating', 'dignities', 'limitations', 'general']
+        copy(opts.db_table, [opts.get_field(name).column for name in fields], (
+            (
+                product.id, self.now.isoformat(), f'User #{index}',
+                self.random.randint(1, 5),
+                'Some dignities.', 'Some limitations.', 'Some general opinion.',
+            )
+            for product in products
+            for index in range(1, self.size.feedbacks + 1)
+        ))
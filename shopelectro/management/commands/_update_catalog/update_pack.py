@@ -11,6 +11,7 @@ from django.conf import settings
 from django.db import models
 
 from catalog.models_expressions import Substring
+from shopelectro import invalidation
 from shopelectro.exception import UpdateCatalogException
 from shopelectro.models import TagQuerySet, TagGroup
 
@@ -49,10 +50,13 @@ def update_in_packs(packs: TagQuerySet):
     )
 
     for pack in packs:
-        in_pack = sum(map(int, pack.in_pack_str.split('+')))
-        pack.products.all().update(in_pack=max(in_pack, 1))
+        in_pack = max(sum(map(int, pack.in_pack_str.split('+'))), 1)
+        products = pack.products.exclude(in_pack=in_pack)
+        # queryset update sends no signals
+        invalidation.changed(products=list(products.values_list('id', flat=True)))
+        products.update(in_pack=in_pack)
 
 
 def main(*args, **kwargs):
-    packs = find_pack_group().tags.all().prefetch_related('products')
+    packs = find_pack_group().tags.all()
     update_in_packs(packs)
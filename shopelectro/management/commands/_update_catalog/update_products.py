@@ -14,6 +14,7 @@ from django.db import transaction
 from django.db.models import QuerySet
 from django.template.loader import render_to_string
 
+from shopelectro import invalidation
 from shopelectro.management.commands._update_catalog.utils import (
     XmlFile, is_correct_uuid, NOT_SAVE_TEMPLATE, UUID, Data, floor
 )
@@ -259,6 +260,10 @@ def delete(data: Dict[UUID, Data]):
     uuids = list(data)
     pages_to_deactivate = ProductPage.objects.exclude(
         shopelectro_product__uuid__in=uuids).exclude(is_active=False)
+    # queryset update sends no signals
+    invalidation.changed(
+        pages=list(pages_to_deactivate.values_list('id', flat=True)), sitemap=True,
+    )
     pages_to_deactivate.update(is_active=False)
     deactivated_count = pages_to_deactivate.count()
     logger.info(f'{deactivated_count} products and {deactivated_count} pages were deleted.')
@@ -266,17 +271,33 @@ def delete(data: Dict[UUID, Data]):
 
 @transaction.atomic
 def update(data: Dict[UUID, Data]) -> QuerySet:
-    def save(product, field, value):
+    def save(product, field, value) -> bool:
+        """Set the value and return True if it changes the product."""
         if field == 'name' and getattr(product, field, None):
-            return
+            return False
         elif field == 'page':
-            for page_field, page_value in value.items():
-                if not getattr(product.page, page_field, ''):
-                    setattr(product.page, page_field, page_value)
+            return False
         elif field == 'tags':
-            product.tags = merge(list(product.tags.all()), value)
+            tags = list(product.tags.all())
+            merged = merge(tags, value)
+            if merged == tags:
+                return False
+            product.tags = merged
+            return True
         else:
+            is_changed = getattr(product, field, None) != value
             setattr(product, field, value)
+            return is_changed
+
+    def save_page(page, values: dict) -> bool:
+        """Fill the empty page fields and return True if it changes the page."""
+        empty = {
+            field: value for field, value in values.items()
+            if not getattr(page, field, '') and getattr(page, field, '') != value
+        }
+        for field, value in empty.items():
+            setattr(page, field, value)
+        return bool(empty)
 
     def merge(left: List, right: List) -> List:
         """Merge two arrays with order preserving."""
@@ -288,12 +309,16 @@ def update(data: Dict[UUID, Data]) -> QuerySet:
 
     for product in products:
         product_data = data[str(product.uuid)]
-        for field, value in product_data.items():
-            save(product, field, value)
-        product.save()
+        changes = [save(product, field, value) for field, value in product_data.items()]
+        # unchanged products keep their `date_updated` for the sitemap
+        if any(changes):
+            product.save()
         # if 1C contains product, it should be active at DB
-        product.page.is_active = True
-        product.page.save()
+        # unchanged pages are not saved, so their caches are not purged
+        is_page_changed = save_page(product.page, product_data.get('page', {}))
+        if is_page_changed or not product.page.is_active:
+            product.page.is_active = True
+            product.page.save()
 
     logger.info('{} products were updated.'.format(products.count()))
     return products
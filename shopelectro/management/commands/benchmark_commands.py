@@ -0,0 +1,180 @@
+"""
+Benchmark the offline commands: update_catalog, price, excel and images.
+
+Usage:
+- create the synthetic catalog with `test_db --synthetic`
+- launch this command against the same db
+- compare the result with the previous lines of the results file
+
+The command writes CommerceML files of the db catalog with extra new products
+to the ASSETS_DIR and imports them with `update_catalog --no-download`.
+Every stage runs in the forked process, so the peak RSS is measured per stage.
+Forked process shares the memory of this process, so the peak RSS includes
+the memory of the django setup. It's the same for all the commits.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+import typing
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from shopelectro import models
+from shopelectro.management.commands import images, test_db
+from shopelectro.management.commands._test_db import commerceml, synthetic
+
+logger = logging.getLogger(__name__)
+
+STAGES = {
+    'update_catalog': ['--no-download'],
+    'price': [],
+    'excel': [],
+    'images': [],
+}
+
+
+class QueriesCounter:
+    """Replace `connection.queries_log` to count queries without storing them."""
+
+    def __init__(self):
+        self.count = 0
+
+    def append(self, query):
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+
+def measure(command: str, *args) -> typing.Dict[str, float]:
+    counter = QueriesCounter()
+    connection.queries_log, connection.force_debug_cursor = counter, True
+    start = time.monotonic()
+    call_command(command, *args)
+    return {'time': time.monotonic() - start, 'queries': counter.count}
+
+
+def run_stage(command: str, *args) -> typing.Dict[str, float]:
+    """Run the command in the forked process and measure it."""
+    # forked process should not share db connections with the parent one
+    connections.close_all()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        exit_code = 1
+        try:
+            os.write(write_fd, json.dumps(measure(command, *args)).encode())
+            exit_code = 0
+        except BaseException:
+            logger.exception(f'{command} failed.')
+        finally:
+            os._exit(exit_code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        output = pipe.read()
+    _, status, usage = os.wait4(pid, 0)
+    if status:
+        raise CommandError(f'{command} stage failed.')
+    # ru_maxrss is in kilobytes on linux
+    return {**json.loads(output), 'peak_rss': usage.ru_maxrss * 1024}
+
+
+def append_result(path: str, size: dict, stages: dict):
+    """Append the benchmark result to the json lines file."""
+    with open(path, 'a') as file:
+        file.write(json.dumps({
+            'commit': get_commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'size': size,
+            'stages': stages,
+        }) + '\n')
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stdout=subprocess.PIPE, cwd=settings.BASE_DIR, check=True,
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--new-products', type=int, default=1000,
+            help='Number of products, that the import creates.'
+            ' All the db products are updated by the import.',
+        )
+        parser.add_argument(
+            '--images', type=int, default=1000,
+            help='Number of products with images for the images command.',
+        )
+        parser.add_argument(
+            '--stages', nargs='+', choices=list(STAGES), default=list(STAGES),
+        )
+        parser.add_argument(
+            '--output', default=os.path.join(settings.ASSETS_DIR, 'commands_benchmarks.jsonl'),
+            help='Results are appended to the file as json lines.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        is_test_db = settings.DATABASES['default']['NAME'] == test_db.TEST_DB
+        assert is_test_db, \
+            f'The benchmark changes the db. Use the database named "{test_db.TEST_DB}".'
+
+        catalog = commerceml.Catalog(options['new_products'], seed=options['seed'])
+        size = {
+            'products': len(catalog.products),
+            'new_products': options['new_products'],
+            'images': options['images'],
+        }
+        image_dirs = self.create_images(options['images'])
+        try:
+            catalog.write()
+            stages = {
+                stage: run_stage(stage, *STAGES[stage])
+                for stage in options['stages']
+            }
+        finally:
+            catalog.remove()
+            for path in image_dirs:
+                shutil.rmtree(path, ignore_errors=True)
+
+        for stage, result in stages.items():
+            self.stdout.write(
+                '{stage}: {time:.2f}s, {queries} queries, peak RSS {rss:.1f}MB.'.format(
+                    stage=stage, rss=result['peak_rss'] / 2 ** 20, **result,
+                )
+            )
+        append_result(options['output'], size, stages)
+
+    @staticmethod
+    def create_images(count: int) -> typing.List[str]:
+        """Place images to the folders of the images command. Return created folders."""
+        created = []
+        vendor_codes = (
+            models.Product.objects
+            .order_by('id')
+            .values_list('vendor_code', flat=True)[:count]
+        )
+        for vendor_code in vendor_codes:
+            path = os.path.join(images.IMAGES_ROOT_FOLDER_NAME, str(vendor_code))
+            if os.path.exists(path):
+                continue
+            os.makedirs(path)
+            created.append(path)
+            for name in ['main.jpg', '1.jpg']:
+                shutil.copy(synthetic.IMAGE, os.path.join(path, name))
+        return created
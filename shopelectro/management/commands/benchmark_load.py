@@ -0,0 +1,128 @@
+"""
+Load benchmark of the running app on the category and cart endpoints.
+
+Every client is a thread with its own session. It requests category pages,
+adds products to the cart and gets the cart in turn until the duration ends.
+Run it against the app with the different gunicorn profiles to compare them.
+See `etc/gunicorn.py` for the profiles.
+"""
+import random
+import statistics
+import time
+import typing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from shopelectro import models, sitemaps
+from shopelectro.management.commands import warmup_cache
+from shopelectro.management.commands._benchmarks import percentile
+
+ENDPOINTS = ['category', 'cart_add', 'cart_get']
+Result = typing.Tuple[str, float, bool]
+
+
+class Client:
+
+    def __init__(self, base_url: str, categories: typing.List[str], products: typing.List[int]):
+        self.base_url = base_url.rstrip('/')
+        self.categories = categories
+        self.products = products
+        self.session = requests.Session()
+        # The same headers as nginx sets. See `warmup_cache.Crawler`.
+        self.session.headers.update({
+            'Host': settings.SITE_DOMAIN_NAME,
+            'X-Forwarded-Proto': 'https',
+            'Referer': f'https://{settings.SITE_DOMAIN_NAME}/',
+            'User-Agent': warmup_cache.USER_AGENTS['desktop'],
+        })
+
+    def request(self, endpoint: str) -> bool:
+        timeout = settings.CACHE_WARMUP['timeout']
+        if endpoint == 'category':
+            response = self.session.get(
+                self.base_url + random.choice(self.categories), timeout=timeout,
+            )
+        elif endpoint == 'cart_add':
+            response = self.session.post(
+                self.base_url + reverse('cart_add'),
+                data={'product': random.choice(self.products), 'quantity': 1},
+                headers={'X-CSRFToken': self.session.cookies.get('csrftoken', '')},
+                timeout=timeout,
+            )
+        else:
+            response = self.session.get(self.base_url + reverse(endpoint), timeout=timeout)
+        return response.status_code == 200
+
+    def run(self, deadline: float) -> typing.List[Result]:
+        try:
+            # get the csrf cookie
+            self.session.get(self.base_url + '/', timeout=settings.CACHE_WARMUP['timeout'])
+        except requests.RequestException:
+            pass
+        results = []
+        for endpoint in cycle(ENDPOINTS):
+            if time.monotonic() > deadline:
+                return results
+            start = time.monotonic()
+            try:
+                is_ok = self.request(endpoint)
+            except requests.RequestException:
+                is_ok = False
+            results.append((endpoint, time.monotonic() - start, is_ok))
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default=settings.CACHE_WARMUP['url'],
+            help='The app address. The local one by default.',
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--duration', type=float, default=30, help='Duration in seconds.',
+        )
+
+    def handle(self, *args, **options):
+        categories = [
+            sitemaps.CategorySitemap().location(category)
+            for category in sitemaps.CategorySitemap().items()[:100]
+        ]
+        products = list(
+            models.Product.objects.active().values_list('id', flat=True)[:100]
+        )
+        deadline = time.monotonic() + options['duration']
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = [
+                result
+                for client_results in executor.map(
+                    lambda _: Client(options['url'], categories, products).run(deadline),
+                    range(options['concurrency']),
+                )
+                for result in client_results
+            ]
+
+        by_endpoint = defaultdict(list)
+        for endpoint, latency, is_ok in results:
+            by_endpoint[endpoint].append((latency, is_ok))
+
+        for endpoint, endpoint_results in by_endpoint.items():
+            latencies = [latency for latency, _ in endpoint_results]
+            self.stdout.write(
+                '{}: {:.1f} req/s, {} errors, p50 {:.0f}ms, p95 {:.0f}ms.'.format(
+                    endpoint,
+                    len(endpoint_results) / options['duration'],
+                    sum(not is_ok for _, is_ok in endpoint_results),
+                    statistics.median(latencies) * 1000,
+                    percentile(latencies, 95) * 1000,
+                )
+            )
+        self.stdout.write('Total: {:.1f} req/s with {} clients.'.format(
+            len(results) / options['duration'], options['concurrency'],
+        ))
@@ -0,0 +1,69 @@
+"""
+Generate the sitemap files offline.
+
+The command writes the gzipped shards of every sitemap section
+and the sitemap index, that refers to them, to `settings.SITEMAP_ROOT`.
+Every shard contains `Sitemap.limit` urls at most.
+Nginx serves the files, so crawlers never trigger the sitemap build in the app.
+The `sitemap.xml` view is the fallback until the first generation.
+"""
+import glob
+import gzip
+import logging
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from shopelectro import sitemaps
+
+logger = logging.getLogger(__name__)
+
+INDEX = 'sitemap.xml'
+SHARD = 'sitemap-{section}-{page}.xml.gz'
+
+
+class Site:
+    """The same interface as `django.contrib.sites.models.Site` has."""
+
+    domain = settings.SITE_DOMAIN_NAME
+
+
+def write(path: str, content: str):
+    """Replace the file atomically, so nginx never serves the partial file."""
+    tmp_path = path + '.tmp'
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(tmp_path, 'wt', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+
+    def handle(self, *args, **options):
+        root = settings.SITEMAP_ROOT
+        os.makedirs(root, exist_ok=True)
+
+        shards = []
+        for section, sitemap_class in sitemaps.SITEMAPS.items():
+            sitemap = sitemap_class()
+            for page in sitemap.paginator.page_range:
+                name = SHARD.format(section=section, page=page)
+                urls = sitemap.get_urls(page=page, site=Site())
+                write(os.path.join(root, name), render_to_string('sitemap.xml', {'urlset': urls}))
+                shards.append(name)
+
+        index = render_to_string('sitemap_index.xml', {
+            'sitemaps': [f'{settings.BASE_URL}/{name}' for name in shards],
+        })
+        write(os.path.join(root, INDEX), index)
+        # nginx serves the gzipped index to the clients, that accept it
+        write(os.path.join(root, INDEX + '.gz'), index)
+
+        # the index doesn't refer the stale shards anymore
+        stale = set(glob.glob(os.path.join(root, SHARD.format(section='*', page='*'))))
+        for path in stale - {os.path.join(root, name) for name in shards}:
+            os.remove(path)
+
+        logger.info(f'{len(shards)} sitemap shards were generated.')
@@ -7,6 +7,9 @@ Usage:
 - purge your test db manually, if it had data before this usage
 - launch this command
 - now you have json file, that'll be used by our TDD tests
+
+Use `--synthetic` option to create the big catalog for load and benchmark runs.
+It's not dumped to the fixture. See `_test_db.synthetic` for details.
 """
 import os
 
@@ -18,7 +21,8 @@ from django.core.management.base import BaseCommand
 from images.models import Image
 from pages.models import Page, FlatPage, PageTemplate
 from pages.utils import save_custom_pages, init_redirects_app
-from shopelectro import models as se_models, tests as se_tests
+from shopelectro import logic, models as se_models, tests as se_tests
+from shopelectro.management.commands._test_db import synthetic
 
 TEST_DB = 'test_se'
 
@@ -54,11 +58,43 @@ class Command(BaseCommand):
             ['2 в блистере', '2 в стяжке'],
         ]
 
+    def add_arguments(self, parser):
+        size = synthetic.Size()
+        parser.add_argument(
+            '--synthetic', action='store_true',
+            help='Create the synthetic catalog of the given size instead of the fixture.',
+        )
+        parser.add_argument('--categories', type=int, default=size.categories)
+        parser.add_argument(
+            '--depth', type=int, default=size.depth,
+            help='Depth of the categories tree.',
+        )
+        parser.add_argument(
+            '--products-per-leaf', type=int, default=size.products_per_leaf,
+        )
+        parser.add_argument('--tag-groups', type=int, default=size.tag_groups)
+        parser.add_argument(
+            '--tags-per-group', type=int, default=size.tags_per_group,
+        )
+        parser.add_argument(
+            '--images', type=int, default=size.images,
+            help='Images per product.',
+        )
+        parser.add_argument(
+            '--feedbacks', type=int, default=size.feedbacks,
+            help='Feedbacks per product.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
     def handle(self, *args, **options):
         self.prepare_db()
         save_custom_pages()
         init_redirects_app()
 
+        if options['synthetic']:
+            self.create_synthetic(options)
+            return
+
         roots = self.create_root(2)
         children = self.create_children(2, roots)
         deep_children = self.create_children(2, children)
@@ -84,6 +120,17 @@ class Command(BaseCommand):
         call_command('migrate')
         self.purge_tables()
 
+    def create_synthetic(self, options):
+        size = synthetic.Size(**{field: options[field] for field in synthetic.Size._fields})
+        created = synthetic.Generator(size, seed=options['seed']).generate()
+        self.create_templates()
+        # bulk inserts send no signals, that update search documents
+        logic.search.update()
+        self.stdout.write(
+            'Synthetic catalog created: {categories} categories, {leaves} of them are leaves,'
+            ' {products} products, {tags} tags.'.format(**created)
+        )
+
     @staticmethod
     def save_dump():
         """Save .json dump to fixtures."""
@@ -1,9 +1,11 @@
 import logging
 import time
+from contextlib import ExitStack
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+from shopelectro import invalidation, logic
 from shopelectro.management.commands._update_catalog import (
     utils, update_tags, update_products, update_pack,
 )
@@ -20,13 +22,24 @@ class Command(BaseCommand):
             default=[],
             help='Send an email to recipients if products will be created.',
         )
+        parser.add_argument(
+            '--no-download',
+            action='store_false',
+            dest='download',
+            help='Import catalog files, placed to the ASSETS_DIR, without FTP downloading.',
+        )
 
     def handle(self, *args, **kwargs):
         self.update(*args, **kwargs)
 
     @staticmethod
     def update(*args, **kwargs):
-        with utils.download_catalog(destination=settings.ASSETS_DIR):
+        with ExitStack() as stack:
+            if kwargs.get('download', True):
+                stack.enter_context(utils.download_catalog(destination=settings.ASSETS_DIR))
+            # purge cached pages and update search documents once for the whole import
+            stack.enter_context(invalidation.deferred())
+            stack.enter_context(logic.search.deferred())
             with utils.collect_errors(
                 (AssertionError, update_products.UpdateProductError)
             ) as collect_error:
@@ -0,0 +1,134 @@
+"""
+Warm up the page cache after the catalog update.
+
+Crawl the most visited pages against the local app: index, categories,
+top products and categories with tags. Every page is requested for every
+device class, because device class is a part of the page cache key.
+Urls are taken from the sitemap classes.
+"""
+import logging
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from shopelectro import sitemaps
+
+logger = logging.getLogger(__name__)
+
+USER_AGENTS = {
+    'desktop': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        ' (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36'
+    ),
+    'mobile': (
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 12_2 like Mac OS X) AppleWebKit/605.1.15'
+        ' (KHTML, like Gecko) Version/12.1 Mobile/15E148 Safari/604.1'
+    ),
+}
+
+
+def locations(sitemap, items) -> typing.Iterator[str]:
+    return (sitemap.location(item) for item in items)
+
+
+def get_urls(products_limit: int) -> typing.Iterator[str]:
+    """Urls in the order of their importance."""
+    product_sitemap = sitemaps.ProductSitemap()
+    top_products = (
+        product_sitemap.items()
+        .filter(Q(id__in=settings.TOP_PRODUCTS) | Q(is_popular=True))
+        .order_by('-is_popular', 'id')
+    )
+    return chain.from_iterable(
+        locations(sitemap, items) for sitemap, items in [
+            (sitemaps.IndexSitemap(), sitemaps.IndexSitemap().items()),
+            (sitemaps.CategorySitemap(), sitemaps.CategorySitemap().items().iterator()),
+            (product_sitemap, top_products[:products_limit].iterator()),
+            (sitemaps.CategoryWithTagsSitemap(), sitemaps.CategoryWithTagsSitemap().items()),
+        ]
+    )
+
+
+class Crawler:
+    """Request pages with bounded concurrency and the time budget."""
+
+    def __init__(self, base_url: str, concurrency: int, time_budget: float):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.deadline = time.monotonic() + time_budget
+        # The same headers as nginx sets.
+        # The page cache key contains the host and the scheme.
+        self.headers = {
+            'Host': settings.SITE_DOMAIN_NAME,
+            'X-Forwarded-Proto': 'https',
+        }
+
+    def fetch(self, url: str, device: str) -> typing.Optional[bool]:
+        """Return None if the time budget is exhausted."""
+        if time.monotonic() > self.deadline:
+            return None
+        try:
+            response = requests.get(
+                self.base_url + url,
+                headers={**self.headers, 'User-Agent': USER_AGENTS[device]},
+                timeout=settings.CACHE_WARMUP['timeout'],
+                allow_redirects=False,
+            )
+        except requests.RequestException as error:
+            logger.warning(f'Warmup of {url} for {device} failed: {error}')
+            return False
+        return response.status_code == 200
+
+    def crawl(self, urls: typing.Iterable[str]) -> typing.Dict[str, int]:
+        pairs = [(url, device) for url in urls for device in USER_AGENTS]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(lambda pair: self.fetch(*pair), pairs))
+        return {
+            'warmed': results.count(True),
+            'failed': results.count(False),
+            'skipped': results.count(None),
+        }
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.CACHE_WARMUP['concurrency'],
+            help='Max number of simultaneous requests.',
+        )
+        parser.add_argument(
+            '--time-budget', type=float,
+            default=settings.CACHE_WARMUP['time_budget'],
+            help='Stop to request new pages after the given number of seconds.',
+        )
+        parser.add_argument(
+            '--products', type=int,
+            default=settings.CACHE_WARMUP['products'],
+            help='Max number of top products to warm up.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Max number of urls to warm up. Useful for debugging.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        urls = islice(get_urls(options['products']), options['limit'])
+        result = Crawler(
+            base_url=settings.CACHE_WARMUP['url'],
+            concurrency=options['concurrency'],
+            time_budget=options['time_budget'],
+        ).crawl(urls)
+        logger.info(
+            'Cache warmup completed in {:.2f}s. Pages warmed: {warmed},'
+            ' failed: {failed}, skipped by time budget: {skipped}.'
+            .format(time.time() - start, **result)
+        )
@@ -0,0 +1,155 @@
+"""
+Page cache middleware, that is aware of the device class and catalog changes.
+
+Pages are rendered differently for mobile and desktop devices.
+So the device class is a dimension of the page cache key.
+The same way the pages generation is a dimension of the key.
+See `shopelectro.invalidation` for details.
+
+Dimensions are passed to the cache key with the internal headers
+and never go to the `Vary` header of the response.
+Full user agent in `Vary` would split the cache into thousands of entries.
+"""
+from django.middleware import cache
+from django.utils.cache import cc_delim_re, get_cache_key, get_max_age, patch_vary_headers
+from django.utils.decorators import decorator_from_middleware_with_args
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from shopelectro import cart, devices, invalidation
+
+DEVICE_HEADER = 'X-Device-Class'
+DEVICE_META_KEY = 'HTTP_X_DEVICE_CLASS'
+GENERATION_HEADER = 'X-Pages-Generation'
+GENERATION_META_KEY = 'HTTP_X_PAGES_GENERATION'
+INTERNAL_HEADERS = [DEVICE_HEADER, GENERATION_HEADER]
+
+
+def device_class(request) -> str:
+    """
+    Put the device bucket to the request.
+
+    The client's header is always overwritten, because pages are rendered
+    by the user agent. Otherwise a client could put mobile pages to the desktop bucket.
+    """
+    request.META[DEVICE_META_KEY] = devices.device_class(request)
+    return request.META[DEVICE_META_KEY]
+
+
+def set_cache_dimensions(request):
+    """Put dimensions to the request. Client's headers with the same names are never trusted."""
+    device_class(request)
+    # the response is cached with the generation, that the request was fetched with
+    if not hasattr(request, '_pages_generation'):
+        request._pages_generation = invalidation.pages_generation()
+    request.META[GENERATION_META_KEY] = request._pages_generation
+
+
+def vary_on_dimensions(response):
+    patch_vary_headers(response, INTERNAL_HEADERS)
+    return response
+
+
+def hide_internal_vary(response):
+    """Remove the internal headers from the response's `Vary` header."""
+    if response is None or not response.has_header('Vary'):
+        return response
+    internal = {header.lower() for header in INTERNAL_HEADERS}
+    headers = [
+        header for header in cc_delim_re.split(response['Vary'])
+        if header.lower() not in internal
+    ]
+    if headers:
+        response['Vary'] = ', '.join(headers)
+    else:
+        del response['Vary']
+    return response
+
+
+def register_dependencies(middleware, request, response, dependencies=()):
+    """Register the cached response by entities it depends on."""
+    is_cached = (
+        getattr(request, '_cache_update_cache', False)
+        and response.status_code == 200
+        and not response.streaming
+        and get_max_age(response) != 0
+    )
+    if not is_cached:
+        return
+    cache_key = get_cache_key(
+        request, middleware.key_prefix, request.method, cache=middleware.cache,
+    )
+    if cache_key:
+        invalidation.register(
+            cache_key, {*dependencies, *invalidation.get_dependencies(request)},
+        )
+
+
+class UserAgentMiddleware(MiddlewareMixin):
+    """Replace `django_user_agents` middleware with the memoized classifier."""
+
+    def process_request(self, request):
+        request.user_agent = SimpleLazyObject(lambda: devices.get_user_agent(request))
+
+
+class CartVersionMiddleware(MiddlewareMixin):
+    """
+    Keep the cart version cookie up to date. See `shopelectro.cart`.
+
+    Put it above `SessionMiddleware`, so the session is saved before the cookie is signed.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        # only the requests, that loaded the session, could change the cart
+        if session is not None and session.accessed:
+            cart.set_version(request, response)
+        if getattr(request, '_cart_version_used', False):
+            # the page cache should not share pages with the different carts
+            patch_vary_headers(response, ['Cookie'])
+        return response
+
+
+class UpdateCacheMiddleware(cache.UpdateCacheMiddleware):
+
+    def process_response(self, request, response):
+        set_cache_dimensions(request)
+        response = super().process_response(request, vary_on_dimensions(response))
+        register_dependencies(self, request, response)
+        return hide_internal_vary(response)
+
+
+class FetchFromCacheMiddleware(cache.FetchFromCacheMiddleware):
+
+    def process_request(self, request):
+        set_cache_dimensions(request)
+        return hide_internal_vary(super().process_request(request))
+
+
+class CacheMiddleware(cache.CacheMiddleware):
+
+    def __init__(self, get_response=None, dependencies=(), **kwargs):
+        super().__init__(get_response, **kwargs)
+        self.dependencies = dependencies
+
+    def process_request(self, request):
+        set_cache_dimensions(request)
+        return hide_internal_vary(super().process_request(request))
+
+    def process_response(self, request, response):
+        set_cache_dimensions(request)
+        response = super().process_response(request, vary_on_dimensions(response))
+        register_dependencies(self, request, response, self.dependencies)
+        return hide_internal_vary(response)
+
+
+def cache_page(timeout, *, cache=None, key_prefix=None, dependencies=()):
+    """
+    The same as `django.views.decorators.cache.cache_page`, but device aware.
+
+    :param dependencies: entities, every page of the view depends on.
+    """
+    return decorator_from_middleware_with_args(CacheMiddleware)(
+        cache_timeout=timeout, cache_alias=cache, key_prefix=key_prefix,
+        dependencies=dependencies,
+    )
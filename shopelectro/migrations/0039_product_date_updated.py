@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.28 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopelectro', '0038_remove_order_revenue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='date_updated',
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, verbose_name='date updated',
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.28 on 2026-10-19 14:00
+from __future__ import unicode_literals
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_documents(apps, schema_editor):
+    # the same query, as `shopelectro.logic.search.update` runs for all pages
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO shopelectro_searchdocument (page_id, document)
+            SELECT
+                page.id,
+                setweight(to_tsvector('russian', coalesce(page.name, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(product.vendor_code::text, '')), 'A')
+                || setweight(to_tsvector(
+                    'russian', coalesce(string_agg(tag.name, ' '), '')
+                ), 'B')
+                || setweight(to_tsvector(
+                    'russian', regexp_replace(coalesce(page.content, ''), '<[^>]+>', ' ', 'g')
+                ), 'C')
+            FROM pages_page page
+            LEFT JOIN shopelectro_product product ON product.page_id = page.id
+            LEFT JOIN shopelectro_product_tags product_tag ON product_tag.product_id = product.id
+            LEFT JOIN shopelectro_tag tag ON tag.id = product_tag.tag_id
+            GROUP BY page.id, product.vendor_code
+            ON CONFLICT (page_id) DO UPDATE SET document = EXCLUDED.document
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0015_add_validation_to_template'),
+        ('shopelectro', '0039_product_date_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('page', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                    related_name='search_document', serialize=False, to='pages.Page',
+                )),
+                ('document', django.contrib.postgres.search.SearchVectorField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['document'], name='shopelectro_searchdoc_gin',
+            ),
+        ),
+        migrations.RunPython(create_documents, migrations.RunPython.noop),
+    ]
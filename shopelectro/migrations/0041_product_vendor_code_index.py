@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.28 on 2026-10-19 16:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopelectro', '0040_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='vendor_code',
+            field=models.SmallIntegerField(db_index=True, verbose_name='vendor_code'),
+        ),
+    ]
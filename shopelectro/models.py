@@ -5,8 +5,11 @@ import typing
 from uuid import uuid4
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from catalog import models as catalog_models
@@ -107,6 +110,10 @@ class MatrixBlock(models.Model):
         return rows
 
 
+# `Product.vendor_code` is the small integer
+VENDOR_CODE_MAX = 32767
+
+
 class Product(
     catalog_models.AbstractProduct,
     catalog_models.AbstractPosition,
@@ -140,7 +147,7 @@ class Product(
     # We doesn't use the id field instead, because it is auto-increment sequence,
     # that can't be changed easily. We decided to avoid that complexity.
     # https://www.postgresql.org/docs/current/functions-sequence.html
-    vendor_code = models.SmallIntegerField(verbose_name=_('vendor_code'))
+    vendor_code = models.SmallIntegerField(db_index=True, verbose_name=_('vendor_code'))
     uuid = models.UUIDField(default=uuid4, editable=False)
     purchase_price = models.FloatField(
         default=0, verbose_name=_('purchase_price'))
@@ -156,6 +163,14 @@ class Product(
         verbose_name=_('in pack'),
     )
 
+    # sitemap's lastmod. The catalog import saves only changed products.
+    # `auto_now` is not used: fixtures lack the field and loaddata skips `pre_save`.
+    date_updated = models.DateTimeField(default=timezone.now, verbose_name=_('date updated'))
+
+    def save(self, *args, **kwargs):
+        self.date_updated = timezone.now()
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('product', args=(self.vendor_code,))
 
@@ -244,16 +259,26 @@ class Order(ecommerce_models.Order):
         """Return label for an order's payment option."""
         return PaymentOptions[self.payment_type].value
 
+    @property
+    def total_price(self):
+        # `set_positions` computes the total once from the cart lines
+        total = getattr(self, '_total_price', None)
+        return super().total_price if total is None else total
+
+    @transaction.atomic
     def set_positions(self, cart):
         """
         Save cart's state into Order instance.
 
+        Positions are inserted with the single query,
+        so big carts are saved with the constant number of queries.
+
         @todo #589:60m Create Cart model.
          See details here: https://github.com/fidals/shopelectro/pull/590#discussion_r222544672
         """
         self.save()
-        for id_, position in cart:
-            self.positions.create(
+        positions = [
+            self.positions.model(
                 order=self,
                 product_id=id_,
                 vendor_code=position['vendor_code'],
@@ -261,6 +286,12 @@ class Order(ecommerce_models.Order):
                 price=position['price'],
                 quantity=position['quantity'],
             )
+            for id_, position in cart
+        ]
+        self.positions.model.objects.bulk_create(positions)
+        self._total_price = sum(
+            position.price * position.quantity for position in positions
+        )
         return self
 
 
@@ -317,3 +348,22 @@ class Tag(catalog_models.Tag):
     )
 
     objects = TagManager()
+
+
+class SearchDocument(models.Model):
+    """
+    Weighted full-text document of a page: category, product or any other one.
+
+    See `shopelectro.logic.search` for the document content and sync.
+    """
+
+    page = models.OneToOneField(
+        pages_models.Page,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+    )
+    document = SearchVectorField()
+
+    class Meta:
+        indexes = [GinIndex(fields=['document'], name='shopelectro_searchdoc_gin')]
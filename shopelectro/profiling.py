@@ -0,0 +1,149 @@
+"""
+Sampling requests profiler, that is safe for production.
+
+The middleware profiles a random fraction of requests, see `settings.PROFILING`.
+Profile contains the view name, total time, db time, queries count,
+duplicated queries fingerprints, template render time and page cache status.
+Duplicated fingerprints point to N+1 queries.
+
+Queries are captured without opening the db connection,
+so requests, served from the page cache, don't connect to the db.
+
+Profiles are written to the structured log and to the ring buffer in the memory.
+Every worker process has its own buffer. Admin shows the buffer of the worker,
+that served the admin request, so the log is the only full source of profiles.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+import typing
+from collections import Counter, deque
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\bIN \((?:\?, )*\?\)')
+
+
+class Profiles:
+    """Thread-safe ring buffer of the last profiles."""
+
+    def __init__(self, size: int):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def all(self) -> typing.List[dict]:
+        """Return profiles from the newest one."""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profiles = Profiles(settings.PROFILING['buffer_size'])
+
+
+def fingerprint(sql: str) -> str:
+    """Replace query literals, so queries with different arguments have the same print."""
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', sql))
+
+
+def duplicates(queries: typing.List[dict]) -> typing.List[dict]:
+    counts = Counter(fingerprint(query['sql']) for query in queries)
+    return [
+        {'fingerprint': sql, 'count': count}
+        for sql, count in counts.most_common()
+        if count >= settings.PROFILING['duplicates_threshold']
+    ]
+
+
+@contextmanager
+def captured_queries() -> typing.Iterator[typing.List[dict]]:
+    """
+    Capture queries of the block the same way `CaptureQueriesContext` does.
+
+    `CaptureQueriesContext` opens the db connection, this one doesn't.
+    """
+    force_debug_cursor = connection.force_debug_cursor
+    connection.force_debug_cursor = True
+    start = len(connection.queries_log)
+    queries = []
+    try:
+        yield queries
+    finally:
+        connection.force_debug_cursor = force_debug_cursor
+        queries.extend(islice(connection.queries_log, start, None))
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if not match:
+        return ''
+    view = getattr(match.func, 'view_class', match.func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def cache_status(request) -> str:
+    """Status of the page cache. See `django.middleware.cache.FetchFromCacheMiddleware`."""
+    if request.method not in ('GET', 'HEAD') or not hasattr(request, '_cache_update_cache'):
+        return 'skip'
+    return 'miss' if request._cache_update_cache else 'hit'
+
+
+class ProfilingMiddleware:
+    """Profile the sampled requests. Should be the first middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING['sample_rate']:
+            return self.get_response(request)
+
+        request._profile_render = {}
+        start = time.monotonic()
+        with captured_queries() as queries:
+            response = self.get_response(request)
+        total = time.monotonic() - start
+
+        render = request._profile_render
+        profile = {
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'view': view_name(request),
+            'time': total,
+            'db_time': sum(float(query['time']) for query in queries),
+            'queries': len(queries),
+            'duplicates': duplicates(queries),
+            'render_time': render['end'] - render['start'] if 'end' in render else None,
+            'cache': cache_status(request),
+            'date': time.time(),
+        }
+        profiles.add(profile)
+        logger.info(json.dumps(profile, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        """Measure the template response rendering. It starts right after this hook."""
+        render = getattr(request, '_profile_render', None)
+        if render is not None:
+            render['start'] = time.monotonic()
+            response.add_post_render_callback(
+                lambda _: render.update(end=time.monotonic())
+            )
+        return response
@@ -1,9 +1,9 @@
 import typing
 
 from django import http
-from django_user_agents.utils import get_user_agent
 
 from pages.request_data import Request
+from shopelectro import devices
 from shopelectro.exception import Http400
 
 
@@ -28,10 +28,9 @@ class Catalog(Request):
     @property
     def length(self):
         """Max size of products list depends on the device type."""
-        is_mobile = get_user_agent(self.request).is_mobile
         return (
             self.PRODUCTS_ON_PAGE_MOB
-            if is_mobile else self.PRODUCTS_ON_PAGE_PC
+            if devices.is_mobile(self.request) else self.PRODUCTS_ON_PAGE_PC
         )
 
     def get_view_type(self):
@@ -81,8 +81,10 @@ INSTALLED_APPS = [
 # Stick to this ordering
 # https://docs.djangoproject.com/en/1.11/ref/middleware/#middleware-ordering
 MIDDLEWARE = [
+    'shopelectro.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.middleware.cache.UpdateCacheMiddleware',
+    'shopelectro.middleware.UpdateCacheMiddleware',
+    'shopelectro.middleware.CartVersionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,9 +92,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware',
+    'shopelectro.middleware.FetchFromCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django_user_agents.middleware.UserAgentMiddleware',
+    'shopelectro.middleware.UserAgentMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'refarm_redirects.middleware.RedirectAllMiddleware',
 ]
@@ -113,7 +115,7 @@ TEMPLATES = [
                 'django.template.context_processors.static',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'ecommerce.context_processors.cart',
+                'shopelectro.context_processors.cart',
                 'shopelectro.context_processors.shop',
             ],
         },
@@ -160,6 +162,8 @@ FORMAT_MODULE_PATH = [
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
+# the `sitemap` command writes files here, nginx serves them
+SITEMAP_ROOT = os.path.join(STATIC_ROOT, 'sitemap')
 
 STATICFILES_STORAGE = 'shopelectro.static_storage.DroppedPricesManifestStaticFilesStorage'
 
@@ -226,6 +230,38 @@ LOGGING = {
     },
 }
 
+# Parsed user agents are memoized in the process memory.
+# See `shopelectro.devices` for details.
+USER_AGENTS_LRU_SIZE = 1000
+
+# Page cache warmup after the catalog update.
+# See `warmup_cache` django command for details.
+CACHE_WARMUP = {
+    # the local app address, not the public one
+    'url': os.environ.get(
+        'CACHE_WARMUP_URL',
+        'http://app:{}'.format(os.environ.get('VIRTUAL_HOST_PORT', '8000')),
+    ),
+    'concurrency': 4,
+    'time_budget': 15 * 60,  # in seconds
+    'timeout': 120,  # the same as nginx's proxy_read_timeout
+    'products': 200,
+}
+
+# Admin changelists with more estimated rows show the estimate instead of the exact count.
+# See `shopelectro.admin.EstimatedCountPaginator` for details.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Sampling requests profiler. See `shopelectro.profiling` for details.
+PROFILING = {
+    # fraction of the profiled requests
+    'sample_rate': float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01)),
+    # number of the last profiles, shown in the admin
+    'buffer_size': 500,
+    # the same query repeated the given times in a request is reported as N+1
+    'duplicates_threshold': 3,
+}
+
 TEST_RUNNER = 'refarm_test_utils.runners.RefarmTestRunner'
 # address for selenium-based tests
 # CI doesn't resolve a host name, so we have to use the host address
@@ -265,6 +301,10 @@ EMAIL_SUBJECTS = {
 }
 
 # Email configs
+# Emails are sent by the celery mail queue. See `shopelectro.mail` for details.
+EMAIL_BACKEND = 'shopelectro.mail.QueueEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+MAIL_RETRIES = 5
 # It is fake-pass. Correct pass will be created on `docker-compose up` stage from `docker/.env`
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', 'so_secret_pass')
 EMAIL_HOST_USER = 'info@shopelectro.ru'
@@ -284,6 +324,8 @@ ENV_TYPE = os.environ.get('ENV_TYPE', 'PROD')  # LOCAL | CI | PROD
 # 'Prod' <-> 'Product #1 of Category #0 of Category #1' = 0.17
 # About trigram similarity: https://goo.gl/uYFcxN
 TRIGRAM_MIN_SIMILARITY = 0.15
+# trigram | fulltext. See `shopelectro.logic.search` for the fulltext mode.
+SEARCH_MODE = os.environ.get('SEARCH_MODE', 'trigram')
 
 # Used in admin image uploads
 MODEL_TYPES = {
@@ -0,0 +1,108 @@
+"""Signal receivers, that keep shared caches consistent with the catalog."""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from pages import models as pages_models
+from shopelectro import invalidation, logic, models
+
+
+def is_header_menu_page(page: pages_models.Page) -> bool:
+    return (
+        page.related_model_name == models.Category._meta.db_table
+        or page.slug in settings.HEADER_LINKS['add']
+        or page.slug == 'catalog'
+    )
+
+
+def is_product_page(page: pages_models.Page) -> bool:
+    return page.related_model_name == models.Product._meta.db_table
+
+
+def tag_categories(tag: models.Tag):
+    return models.Product.objects.filter(tags=tag).values_list('category_id', flat=True)
+
+
+def tag_pages(tag: models.Tag):
+    return models.Product.objects.filter(tags=tag).values_list('page_id', flat=True)
+
+
+@receiver([post_save, post_delete])
+def invalidate_header_menu(sender, instance, **kwargs):
+    if isinstance(instance, pages_models.Page) and is_header_menu_page(instance):
+        # a concurrent request would rebuild the old menu with the new version before the commit
+        invalidation.changed(caches=[logic.header.Menu.invalidate])
+
+
+@receiver([post_save, post_delete])
+def invalidate_autocomplete(sender, instance, **kwargs):
+    if isinstance(instance, (models.Category, models.Product, pages_models.Page)):
+        # the catalog import rebuilds the index once in the end
+        invalidation.changed(caches=[logic.autocomplete.Index.invalidate])
+
+
+@receiver([post_save, post_delete])
+def invalidate_search_results(sender, instance, **kwargs):
+    if isinstance(instance, (models.Category, models.Product, pages_models.Page)):
+        invalidation.changed(caches=[logic.search_cache.invalidate])
+
+
+# products relations are not available after the tag removing too
+@receiver([post_save, pre_delete])
+def update_search_documents(sender, instance, **kwargs):
+    if isinstance(instance, pages_models.Page):
+        logic.search.changed(pages=[instance.id])
+    elif isinstance(instance, (models.Category, models.Product)):
+        logic.search.changed(pages=[instance.page_id])
+    elif isinstance(instance, models.Tag):
+        logic.search.changed(pages=tag_pages(instance))
+
+
+@receiver([post_save, post_delete])
+def invalidate_pages(sender, instance, **kwargs):
+    if not isinstance(instance, pages_models.Page):
+        return
+    if is_product_page(instance):
+        invalidation.changed(pages=[instance.id], sitemap=True)
+    else:
+        # every page renders the header menu and links to other pages
+        invalidation.changed(all_pages=True, sitemap=True)
+
+
+@receiver([post_save, post_delete], sender=models.Product)
+def invalidate_product(sender, instance, signal, **kwargs):
+    invalidation.changed(
+        products=[instance.id],
+        categories=[instance.category_id],
+        sitemap=signal is post_delete or kwargs.get('created', False),
+    )
+
+
+@receiver([post_save, post_delete], sender=models.Category)
+def invalidate_category(sender, instance, **kwargs):
+    invalidation.changed(
+        categories=[instance.id, instance.parent_id],
+        all_pages=True,
+        sitemap=True,
+    )
+
+
+# products relations are not available after the tag removing,
+# so deleted tags are handled before the removing.
+@receiver([post_save, pre_delete], sender=models.Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    invalidation.changed(categories=list(tag_categories(instance)), sitemap=True)
+
+
+@receiver(m2m_changed, sender=models.Product.tags.through)
+def invalidate_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        products = [instance.id]
+    else:
+        products = pk_set or instance.products.values_list('id', flat=True)
+    invalidation.changed(products=list(products), sitemap=True)
+    logic.search.changed(
+        pages=models.Product.objects.filter(id__in=products).values_list('page_id', flat=True),
+    )
@@ -1,8 +1,12 @@
+from collections import defaultdict, OrderedDict
 from datetime import datetime
-from typing import Generator, Tuple
+from itertools import chain
+from typing import Dict, List, Tuple
 
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Max
 from django.urls import reverse
+from django.utils.functional import cached_property
 
 from pages.models import CustomPage, Page, PageManager
 from shopelectro.models import Category, Product, Tag
@@ -29,35 +33,97 @@ class IndexSitemap(Sitemap):
         return datetime.now()
 
 
-class CategorySitemap(AbstractSitemap):
+def get_category_parents() -> Dict[int, int]:
+    # inactive categories pass their products' data to the active ancestors
+    return dict(Category.objects.values_list('id', 'parent_id'))
+
+
+def get_categories_lastmod() -> Dict[int, datetime]:
+    """Return the last update of products for every category with its descendants."""
+    parents = get_category_parents()
+    products_lastmod = (
+        Product.objects
+        .order_by()
+        .values('category_id')
+        .annotate(lastmod=Max('date_updated'))
+        .values_list('category_id', 'lastmod')
+    )
+
+    lastmods = {}
+    for category_id, lastmod in products_lastmod:
+        # ancestors are never older, than their descendants
+        while category_id is not None and lastmods.get(category_id, lastmod) <= lastmod:
+            lastmods[category_id] = lastmod
+            category_id = parents[category_id]
+    return lastmods
+
+
+class CategoryLastmodMixin:
+
+    @cached_property
+    def categories_lastmod(self) -> Dict[int, datetime]:
+        return get_categories_lastmod()
+
+    def category_lastmod(self, category: Category):
+        return self.categories_lastmod.get(category.id)
+
+
+class CategorySitemap(CategoryLastmodMixin, AbstractSitemap):
 
     def items(self):
-        return Category.objects.filter(page__is_active=True)
+        return Category.objects.filter(page__is_active=True).select_related('page')
 
+    def lastmod(self, category):
+        return self.category_lastmod(category)
 
-def get_categories_with_tags() -> Generator[
-    Tuple[Category, Tag], None, None
-]:
-    """
-    Return all unique Category+TagGroup pairs.
 
-    Currently, tags per category is limited to 1 tag (by SEO requirements).
-    So, for each tags group in each category we'll get 1 tag.
+def get_categories_with_tags() -> List[Tuple[Category, Tag]]:
     """
-    for category in Category.objects.filter(page__is_active=True):
-        products = Product.objects.filter_descendants(category)
-        tags = Tag.objects.filter_by_products(products)
-        for group_name, group_tags in tags.group_tags().items():
-            for group_tag in group_tags:
-                yield category, group_tag
-
+    Return all unique Category+Tag pairs.
 
-class CategoryWithTagsSitemap(AbstractSitemap):
+    Category has the tag, if any product of the category's descendants has it.
+    Products' category+tag pairs are fetched with the single query.
+    Then every pair is spread to the category's ancestors through the tree.
+    So the pairs take the constant number of queries for any catalog size.
+    """
+    categories = Category.objects.filter(page__is_active=True).select_related('page')
+    parents = get_category_parents()
+    through = Product.tags.through
+    pairs = (
+        through.objects
+        .values_list('product__category_id', 'tag_id')
+        .distinct()
+        .iterator()
+    )
+
+    category_tags = defaultdict(set)
+    for category_id, tag_id in pairs:
+        # ancestors of the category with the tag have the tag already
+        while category_id is not None and tag_id not in category_tags[category_id]:
+            category_tags[category_id].add(tag_id)
+            category_id = parents[category_id]
+
+    tags = {
+        tag.id: tag
+        for tag in Tag.objects.filter(id__in=set(chain.from_iterable(category_tags.values())))
+    }
+    # keep the tags ordering for every category
+    positions = {id_: position for position, id_ in enumerate(tags)}
+    return [
+        (category, tags[tag_id])
+        for category in categories
+        for tag_id in sorted(category_tags[category.id], key=positions.get)
+    ]
+
+
+class CategoryWithTagsSitemap(CategoryLastmodMixin, AbstractSitemap):
 
     def items(self):
-        # `items` method can't return generator (by django design)
-        # so we moved items collection code to dedicated function
-        return list(get_categories_with_tags())
+        return get_categories_with_tags()
+
+    def lastmod(self, item):
+        category, _ = item
+        return self.category_lastmod(category)
 
     def location(self, item):
         category, tag = item
@@ -72,9 +138,25 @@ class ProductSitemap(AbstractSitemap):
     def items(self):
         return Product.objects.filter(page__is_active=True)
 
+    def lastmod(self, product):
+        return product.date_updated
+
 
 class PagesSitemap(AbstractSitemap):
 
     def items(self):
         assert(isinstance(Page.objects, PageManager))
         return Page.objects.active()
+
+    def lastmod(self, page):
+        return page.date_published
+
+
+# Orders sitemaps instances
+SITEMAPS = OrderedDict([
+    ('index', IndexSitemap),
+    ('category', CategorySitemap),
+    ('category-with-tags', CategoryWithTagsSitemap),
+    ('products', ProductSitemap),
+    ('site', PagesSitemap)
+])
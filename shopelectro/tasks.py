@@ -1,10 +1,11 @@
+import smtplib
 from contextlib import contextmanager
 
 from django.conf import settings
 from django.core.management import call_command
 from selenium.common.exceptions import WebDriverException
 
-from shopelectro import selenium
+from shopelectro import mail, selenium
 from shopelectro.celery import app
 from shopelectro.report import TelegramReport
 from shopelectro.models import CategoryPage
@@ -52,13 +53,44 @@ def update_default_templates():
         call_command('update_default_templates')
 
 
+@app.task
+def generate_sitemap():
+    with report():
+        call_command('sitemap')
+
+
+@app.task
+def warmup_cache():
+    with report():
+        call_command('warmup_cache')
+
+
+@app.task(
+    autoretry_for=(smtplib.SMTPException, OSError),
+    max_retries=settings.MAIL_RETRIES,
+    default_retry_delay=60,
+)
+def send_mail(idempotency_key: str, message: dict):
+    """Send the message, serialized by `mail.QueueEmailBackend`."""
+    mail.send(idempotency_key, message)
+
+
+@app.task
+def send_orders_batch(job_id: str, order_ids: list):
+    """Send emails of the orders, selected in the admin. See `mail.send_orders_batch`."""
+    mail.send_orders_batch(job_id, order_ids)
+
+
 @app.task(autoretry_for=(Exception,), max_retries=3, default_retry_delay=60*10)  # Ignore PycodestyleBear (E226)
 def update_catalog():
     # http://docs.celeryproject.org/en/latest/userguide/canvas.html#map-starmap
     return [
         update_catalog_command(),
         update_default_templates(),
+        generate_sitemap(),
         collect_static(),
+        # the last one, because the catalog update purges cached pages
+        warmup_cache(),
     ]
 
 
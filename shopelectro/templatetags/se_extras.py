@@ -9,7 +9,7 @@ from django.urls import reverse
 
 from images.models import ImageMixin
 from pages.models import Page
-from shopelectro import logic
+from shopelectro import devices, logic
 
 register = template.Library()
 
@@ -19,6 +19,11 @@ def header_menu() -> logic.header.Menu:
     return logic.header.Menu()
 
 
+@register.filter
+def is_mobile(request) -> bool:
+    return devices.is_mobile(request)
+
+
 @register.simple_tag
 def footer_links():
     return settings.FOOTER_LINKS
@@ -1,5 +1,8 @@
+import asyncore
 import base64
 import re
+import smtpd
+import threading
 import time
 from contextlib import contextmanager
 
@@ -19,6 +22,40 @@ enable_russian_language = override_settings(
 )
 
 
+class SMTPStandIn(smtpd.SMTPServer):
+    """Local SMTP server, that keeps received messages in the memory."""
+
+    def __init__(self):
+        super().__init__(('localhost', 0), None, decode_data=True)
+        self.messages = []
+        self.thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1})
+
+    @property
+    def port(self) -> int:
+        return self.socket.getsockname()[1]
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        self.messages.append(data)
+
+    def settings(self):
+        return override_settings(
+            EMAIL_BACKEND='shopelectro.mail.QueueEmailBackend',
+            QUEUED_EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='localhost',
+            EMAIL_PORT=self.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.close()
+        self.thread.join()
+
+
 def try_again_on_stale_element(try_count):
     def wrapper(func):
         def wrapped(*args, **kwargs):
@@ -0,0 +1,186 @@
+"""
+Query count, latency and allocations benchmarks of the storefront hot paths.
+
+Benchmarks run against the synthetic catalog and are excluded from CI.
+Launch them with `python manage.py test --tag benchmark`.
+
+Results are compared with the baselines from `BASELINES_PATH`.
+Absent baselines are recorded by the run, `BENCHMARK_UPDATE=1` rewrites them all.
+Timings are machine dependent, so update baselines on the new machine first.
+"""
+import json
+import os
+import statistics
+import time
+import tracemalloc
+import typing
+
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.helpers import reverse_catalog_url
+from pages.utils import save_custom_pages
+from shopelectro import models
+from shopelectro.management.commands._benchmarks import percentile
+from shopelectro.management.commands._test_db import synthetic
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'assets/benchmarks.json')
+SIZE = synthetic.Size(categories=200, products_per_leaf=50)
+REPEATS = 20
+# Allowed regressions: extra queries count and factors for time and memory.
+QUERIES_THRESHOLD = 0
+TIME_THRESHOLD = 1.3
+ALLOCATIONS_THRESHOLD = 1.2
+
+
+def measure(request: typing.Callable[[], typing.Any]) -> typing.Dict[str, float]:
+    request()  # warm up templates and connections
+
+    with CaptureQueriesContext(connection) as queries:
+        request()
+
+    tracemalloc.start()
+    request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        request()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'queries': len(queries),
+        'p50': statistics.median(timings),
+        'p95': percentile(timings, 95),
+        'allocations': peak,
+    }
+
+
+def load_baselines() -> dict:
+    if os.environ.get('BENCHMARK_UPDATE') or not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as file:
+        return json.load(file)
+
+
+@tag('benchmark')
+class Benchmarks(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.baselines = load_baselines()
+        cls.is_updated = False
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.is_updated:
+            with open(BASELINES_PATH, 'w') as file:
+                json.dump(cls.baselines, file, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        save_custom_pages()
+        synthetic.Generator(SIZE).generate()
+
+    def setUp(self):
+        # root category lists products of the whole subtree
+        self.category = models.Category.objects.root_nodes().select_related('page').first()
+        self.products = models.Product.objects.filter(
+            category__in=self.category.get_descendants(include_self=True),
+        )
+        self.tags = models.Tag.objects.filter(products__in=self.products).distinct()[:2]
+        self.product = self.products.order_by('id').first()
+
+    def assert_benchmark(self, name: str, request: typing.Callable):
+        result = measure(request)
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            self.baselines[name] = result
+            type(self).is_updated = True
+            return
+
+        self.assertLessEqual(
+            result['queries'], baseline['queries'] + QUERIES_THRESHOLD,
+            f'{name}: queries count regressed.',
+        )
+        self.assertLessEqual(
+            result['p95'], baseline['p95'] * TIME_THRESHOLD,
+            f'{name}: p95 latency regressed.',
+        )
+        self.assertLessEqual(
+            result['allocations'], baseline['allocations'] * ALLOCATIONS_THRESHOLD,
+            f'{name}: allocations regressed.',
+        )
+
+    def category_url(self, route='category', route_kwargs=None, tags=None, sorting=None):
+        return reverse_catalog_url(
+            route, {'slug': self.category.page.slug, **(route_kwargs or {})},
+            tags, sorting,
+        )
+
+    def get(self, url: str, **kwargs):
+        def request():
+            response = self.client.get(url, **kwargs)
+            self.assertEqual(200, response.status_code, url)
+        return request
+
+    def post(self, url: str, data: dict):
+        def request():
+            response = self.client.post(url, data)
+            self.assertEqual(200, response.status_code, url)
+        return request
+
+    def test_index(self):
+        self.assert_benchmark('index', self.get('/'))
+
+    def test_category(self):
+        self.assert_benchmark('category', self.get(self.category_url()))
+
+    def test_category_tags(self):
+        self.assert_benchmark('category_tags', self.get(self.category_url(tags=self.tags)))
+
+    def test_category_sorting(self):
+        self.assert_benchmark('category_sorting', self.get(self.category_url(sorting=1)))
+
+    def test_category_tags_sorting(self):
+        self.assert_benchmark(
+            'category_tags_sorting', self.get(self.category_url(tags=self.tags, sorting=1)),
+        )
+
+    def test_load_more_deep_offset(self):
+        offset = self.products.count() - 1
+        self.assert_benchmark(
+            'load_more_deep_offset',
+            self.get(self.category_url('load_more', {'offset': offset}, sorting=0)),
+        )
+
+    def test_product(self):
+        self.assert_benchmark('product', self.get(self.product.url))
+
+    def test_search(self):
+        self.assert_benchmark(
+            'search', self.get('/search/', data={'term': 'Product #1'}),
+        )
+
+    def test_autocomplete(self):
+        self.assert_benchmark(
+            'autocomplete', self.get(reverse('autocomplete'), data={'term': 'Product #1'}),
+        )
+
+    def test_sitemap(self):
+        self.assert_benchmark('sitemap', self.get('/sitemap.xml'))
+
+    def test_cart(self):
+        data = {'product': self.product.id, 'quantity': 1}
+        self.assert_benchmark('cart_add', self.post(reverse('cart_add'), data))
+        self.assert_benchmark('cart_get', self.get(reverse('cart_get')))
+        self.assert_benchmark(
+            'cart_set_count',
+            self.post(reverse('cart_set_count'), {**data, 'quantity': 2}),
+        )
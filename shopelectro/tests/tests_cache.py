@@ -0,0 +1,158 @@
+"""Tests for the page cache infrastructure."""
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, tag
+
+from shopelectro import devices, invalidation, middleware, models
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+DESKTOP_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    ' (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36'
+)
+MOBILE_USER_AGENT = (
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 12_2 like Mac OS X) AppleWebKit/605.1.15'
+    ' (KHTML, like Gecko) Version/12.1 Mobile/15E148 Safari/604.1'
+)
+
+
+@tag('fast')
+@override_settings(CACHES=LOCMEM_CACHES)
+class DeviceCache(TestCase):
+
+    def setUp(self):
+        self.middleware = middleware.CacheMiddleware(
+            cache_timeout=60, cache_alias='default', key_prefix='device_test',
+        )
+
+    def get(self, user_agent: str):
+        return RequestFactory().get('/page/', HTTP_USER_AGENT=user_agent)
+
+    def cache_response(self, user_agent: str, content: str):
+        request = self.get(user_agent)
+        self.assertIsNone(self.middleware.process_request(request))
+        return self.middleware.process_response(request, HttpResponse(content))
+
+    def test_device_class(self):
+        self.assertEqual('desktop', middleware.device_class(self.get(DESKTOP_USER_AGENT)))
+        self.assertEqual('mobile', middleware.device_class(self.get(MOBILE_USER_AGENT)))
+
+    def test_devices_have_separated_cache(self):
+        self.cache_response(DESKTOP_USER_AGENT, 'desktop')
+        self.cache_response(MOBILE_USER_AGENT, 'mobile')
+
+        for user_agent, content in [
+            (DESKTOP_USER_AGENT, b'desktop'),
+            (MOBILE_USER_AGENT, b'mobile'),
+        ]:
+            cached = self.middleware.process_request(self.get(user_agent))
+            self.assertEqual(content, cached.content)
+
+    def test_client_device_header_is_ignored(self):
+        """Mobile page, requested with the desktop header, doesn't go to the desktop bucket."""
+        request = RequestFactory().get(
+            '/page/', HTTP_USER_AGENT=MOBILE_USER_AGENT, HTTP_X_DEVICE_CLASS='desktop',
+        )
+        self.assertIsNone(self.middleware.process_request(request))
+        self.middleware.process_response(request, HttpResponse('mobile'))
+
+        self.assertIsNone(self.middleware.process_request(self.get(DESKTOP_USER_AGENT)))
+
+    def test_device_header_is_not_exposed(self):
+        response = self.cache_response(DESKTOP_USER_AGENT, 'desktop')
+        cached = self.middleware.process_request(self.get(DESKTOP_USER_AGENT))
+        for response_ in [response, cached]:
+            self.assertNotIn(middleware.DEVICE_HEADER, response_.get('Vary', ''))
+
+
+@tag('fast')
+class UserAgentCache(TestCase):
+
+    def setUp(self):
+        self.user_agents = devices.UserAgentCache(maxsize=1)
+
+    def test_parsed_once(self):
+        first = self.user_agents.get(DESKTOP_USER_AGENT)
+        self.assertIs(first, self.user_agents.get(DESKTOP_USER_AGENT))
+        self.assertEqual(
+            {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 1},
+            self.user_agents.info(),
+        )
+
+    def test_size_is_bounded(self):
+        self.user_agents.get(DESKTOP_USER_AGENT)
+        self.user_agents.get(MOBILE_USER_AGENT)
+        self.user_agents.get(DESKTOP_USER_AGENT)
+        self.assertEqual(3, self.user_agents.info()['misses'])
+        self.assertEqual(1, self.user_agents.info()['size'])
+
+    def test_request_parses_user_agent_once(self):
+        request = RequestFactory().get('/', HTTP_USER_AGENT=MOBILE_USER_AGENT)
+        self.assertIs(devices.get_user_agent(request), devices.get_user_agent(request))
+        self.assertTrue(devices.is_mobile(request))
+
+
+@tag('fast')
+@override_settings(CACHES=LOCMEM_CACHES)
+class Invalidation(TransactionTestCase):
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        self.product = models.Product.objects.filter(category__isnull=False).first()
+
+    def cache_page(self, dependency: str):
+        cache.set('page', 'content')
+        invalidation.register('page', [dependency])
+
+    def test_product_change_purges_ancestor_category(self):
+        root = self.product.category.get_root()
+        self.cache_page(invalidation.category(root.page.slug))
+        self.product.price += 1
+        self.product.save()
+        self.assertIsNone(cache.get('page'))
+
+    def test_product_change_keeps_unrelated_pages(self):
+        other_root = (
+            models.Category.objects.root_nodes()
+            .exclude(id=self.product.category.get_root().id)
+            .first()
+        )
+        self.cache_page(invalidation.category(other_root.page.slug))
+        self.product.save()
+        self.assertEqual('content', cache.get('page'))
+
+    def test_tag_change_purges_product_pages(self):
+        tag = self.product.tags.first()
+        self.cache_page(invalidation.category(self.product.category.page.slug))
+        self.product.tags.remove(tag)
+        self.assertIsNone(cache.get('page'))
+
+    def test_deferred_purge(self):
+        self.cache_page(invalidation.product(self.product.id))
+        with invalidation.deferred():
+            self.product.save()
+            self.assertEqual('content', cache.get('page'))
+        self.assertIsNone(cache.get('page'))
+
+    def test_client_generation_header_is_ignored(self):
+        request = RequestFactory().get('/page/', HTTP_X_PAGES_GENERATION='next')
+        middleware.set_cache_dimensions(request)
+        self.assertEqual(
+            invalidation.pages_generation(), request.META[middleware.GENERATION_META_KEY],
+        )
+
+    def test_every_registered_page_is_purged(self):
+        dependency = invalidation.product(self.product.id)
+        for page in ['first', 'second']:
+            cache.set(page, 'content')
+            invalidation.register(page, [dependency])
+        invalidation.purge([dependency])
+        self.assertEqual({}, cache.get_many(['first', 'second']))
+
+    def test_category_change_starts_new_generation(self):
+        generation = invalidation.pages_generation()
+        self.product.category.save()
+        self.assertNotEqual(generation, invalidation.pages_generation())
@@ -4,21 +4,34 @@ Test catalog command, which call other commands like price and excel.
 Note: tests running pretty long.
 """
 import glob
+import gzip
+import json
 import os
 import random
+import shutil
+import tempfile
 import typing
 import unittest
 import urllib.parse
 import uuid
 from collections import defaultdict
+from unittest import mock
 from xml.etree import ElementTree
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.management import call_command
-from django.test import TestCase, override_settings, tag
+from django.db import connection
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
 
+from pages.utils import save_custom_pages
+from shopelectro import sitemaps
 from shopelectro.exception import UpdateCatalogException
-from shopelectro.management.commands import price
+from shopelectro.management.commands import (
+    benchmark_commands, price, sitemap, warmup_cache,
+)
+from shopelectro.management.commands._test_db import commerceml, synthetic
 from shopelectro.management.commands._update_catalog import (
     update_products, update_tags, update_pack,
 )
@@ -99,6 +112,15 @@ class UpdatePack(TestCase):
                     f'Product: {product}, Pack: {pack}'
                 )
 
+    def test_changed_in_packs_purge_pages(self):
+        pack = Tag.objects.create(name='42 в блистере')
+        product = Product.objects.first()
+        product.tags.add(pack)
+
+        with mock.patch('shopelectro.invalidation.changed') as changed:
+            update_pack.update_in_packs(Tag.objects.filter(id=pack.id))
+        changed.assert_called_once_with(products=[product.id])
+
 
 @tag('fast')
 class UpdateProductsUnit(TestCase):
@@ -129,6 +151,16 @@ class UpdateProductsUnit(TestCase):
         # - and this unique page should be active
         self.assertTrue(old_named_pages.first().is_active)
 
+    def test_unchanged_page_is_not_saved(self):
+        """The page, that is not changed by the import, keeps its cached pages."""
+        product = Product.objects.filter(page__is_active=True).first()
+        product_data = {str(product.uuid): {'name': product.name}}
+        with CaptureQueriesContext(connection) as queries:
+            update_products.update(product_data)
+        self.assertFalse([
+            query for query in queries if query['sql'].startswith('UPDATE "pages_page"')
+        ])
+
 
 # @todo #603:30m Resurrect update_catalog tests.
 #  Now we have problems with files downloading.
@@ -421,3 +453,178 @@ class PricesTest(TestCase):
         offer = self.prices['YM'].offers_node[0]
         product = Product.objects.get(vendor_code=offer.attrib['id'])
         self.assertEqual(product.price, float(offer.find('price').text))
+
+
+@tag('fast')
+class WarmupCache(TestCase):
+
+    fixtures = ['dump.json']
+
+    def test_urls_order(self):
+        urls = list(warmup_cache.get_urls(products_limit=1))
+        category = Category.objects.filter(page__is_active=True).first()
+        self.assertEqual('/', urls[0])
+        self.assertIn(category.url, urls)
+
+    def test_time_budget(self):
+        crawler = warmup_cache.Crawler('http://localhost', concurrency=2, time_budget=0)
+        self.assertEqual(
+            {'warmed': 0, 'failed': 0, 'skipped': 2 * len(warmup_cache.USER_AGENTS)},
+            crawler.crawl(['/first/', '/second/']),
+        )
+
+
+@tag('fast')
+class CommerceMLCatalog(TestCase):
+    """Benchmark files are imported the same way as the 1C ones."""
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        assets_settings = override_settings(ASSETS_DIR=root)
+        assets_settings.enable()
+        self.addCleanup(assets_settings.disable)
+
+    def test_import(self):
+        products_count = Product.objects.count()
+        catalog = commerceml.Catalog(new_products=3)
+        catalog.write()
+        call_command('update_catalog', '--no-download')
+
+        self.assertEqual(products_count + 3, Product.objects.count())
+        self.assertTrue(Product.objects.filter(name='New product #1', price__gt=0).exists())
+
+        catalog.remove()
+        self.assertFalse(os.listdir(settings.ASSETS_DIR))
+
+
+@tag('fast')
+class BenchmarkCommands(SimpleTestCase):
+
+    def test_result_lines(self):
+        """Every run appends the line with the measured stages."""
+        stages = {'check': benchmark_commands.run_stage('check')}
+        path = os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        for _ in range(2):
+            benchmark_commands.append_result(path, {'products': 0}, stages)
+
+        with open(path) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(2, len(lines))
+        self.assertEqual({'products': 0}, lines[0]['size'])
+        self.assertEqual({'time', 'queries', 'peak_rss'}, set(lines[0]['stages']['check']))
+        self.assertGreater(lines[0]['stages']['check']['peak_rss'], 0)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class WarmupCacheHits(LiveServerTestCase):
+    """The command warms up the page cache of the live app."""
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warmed_pages_are_cached(self):
+        warmup = {**settings.CACHE_WARMUP, 'url': self.live_server_url}
+        with self.settings(CACHE_WARMUP=warmup):
+            call_command('warmup_cache', products=1)
+
+        urls = ['/', Category.objects.filter(page__is_active=True).first().url]
+        for url in urls:
+            # the same headers, as the first visit of the user has
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    url,
+                    HTTP_HOST=settings.SITE_DOMAIN_NAME,
+                    HTTP_X_FORWARDED_PROTO='https',
+                    HTTP_USER_AGENT=warmup_cache.USER_AGENTS['desktop'],
+                )
+            self.assertEqual(200, response.status_code)
+
+
+@tag('fast')
+class Sitemap(TestCase):
+
+    fixtures = ['dump.json']
+
+    NAMESPACE = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        root_settings = override_settings(SITEMAP_ROOT=root)
+        root_settings.enable()
+        self.addCleanup(root_settings.disable)
+
+    def get_shards(self) -> typing.List[str]:
+        call_command('sitemap')
+        index = ElementTree.parse(os.path.join(settings.SITEMAP_ROOT, sitemap.INDEX))
+        return [
+            os.path.join(settings.SITEMAP_ROOT, urllib.parse.urlparse(loc.text).path.lstrip('/'))
+            for loc in index.iter(f'{self.NAMESPACE}loc')
+        ]
+
+    def test_shards(self):
+        """Index refers the gzipped shards of every sitemap section."""
+        shards = self.get_shards()
+        self.assertEqual(len(sitemaps.SITEMAPS), len(shards))
+        for path in shards:
+            with gzip.open(path) as file:
+                self.assertIsNotNone(ElementTree.parse(file).find(f'{self.NAMESPACE}url'))
+
+    def test_products_lastmod(self):
+        product = Product.objects.filter(page__is_active=True).first()
+        shard = next(path for path in self.get_shards() if '-products-' in path)
+        with gzip.open(shard) as file:
+            urls = {
+                url.find(f'{self.NAMESPACE}loc').text: url.find(f'{self.NAMESPACE}lastmod').text
+                for url in ElementTree.parse(file).iter(f'{self.NAMESPACE}url')
+            }
+        self.assertEqual(
+            product.date_updated.date().isoformat(),
+            urls[settings.BASE_URL + product.url],
+        )
+
+    def test_stale_shards(self):
+        stale = os.path.join(settings.SITEMAP_ROOT, sitemap.SHARD.format(section='old', page=1))
+        open(stale, 'w').close()
+        self.get_shards()
+        self.assertFalse(os.path.exists(stale))
+
+
+@tag('fast')
+class SyntheticCatalog(TestCase):
+
+    def setUp(self):
+        save_custom_pages()
+        self.created = synthetic.Generator(synthetic.Size(
+            categories=7, depth=2, products_per_leaf=3,
+            tag_groups=2, tags_per_group=3, images=0, feedbacks=1,
+        )).generate()
+
+    def test_size(self):
+        self.assertEqual(
+            {'categories': 7, 'leaves': 5, 'products': 15, 'tags': 6},
+            self.created,
+        )
+        self.assertEqual(15 * 2, Product.tags.through.objects.count())
+
+    def test_tree(self):
+        """Computed MPTT fields should be the same as `TreeManager.rebuild` ones."""
+        def tree():
+            return list(
+                Category.objects
+                .order_by('id')
+                .values_list('id', 'lft', 'rght', 'tree_id', 'level')
+            )
+
+        computed = tree()
+        Category.objects.rebuild()
+        self.assertEqual(computed, tree())
@@ -1,6 +1,10 @@
-from django.test import TestCase, override_settings, tag
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings, tag
 
 from pages import models as pages_models
+from search import search as search_engine
 from shopelectro import models, logic
 
 
@@ -31,3 +35,141 @@ class HeaderMenu(TestCase):
     @override_settings(HEADER_LINKS={'exclude': [], 'add': [to_add.slug]})
     def test_add_option(self):
         self.assertIn(self.to_add, logic.header.Menu().as_dict().keys())
+
+
+@tag('fast')
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class HeaderMenuCache(TransactionTestCase):
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        logic.header.Menu.invalidate()
+
+    def test_menu_is_shared_between_instances(self):
+        menu = logic.header.Menu().as_dict()
+        with self.assertNumQueries(0):
+            self.assertEqual(menu, logic.header.Menu().as_dict())
+
+    def test_category_page_change_invalidates_menu(self):
+        root = next(iter(logic.header.Menu().as_dict()))
+        root.name = 'Renamed root'
+        root.save()
+        self.assertIn(
+            'Renamed root',
+            [page.name for page in logic.header.Menu().as_dict()],
+        )
+
+
+@tag('fast')
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class AutocompleteIndex(TransactionTestCase):
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        logic.autocomplete.Index.invalidate()
+
+    def search(self, term: str):
+        return logic.autocomplete.Index.get().search(term, limit=10)
+
+    def test_trigrams(self):
+        """Trigrams are the same as `pg_trgm` ones."""
+        self.assertEqual(
+            {'  a', ' a ', '  б', ' бе', 'бе '},
+            logic.autocomplete.trigrams('A_Бё'),
+        )
+
+    def test_prefix(self):
+        product = models.Product.objects.active().first()
+        prefix = product.name.split()[0][:4]
+        self.assertIn(prefix.lower(), self.search(prefix)[0].name.lower())
+
+    def test_exact_vendor_code(self):
+        """Vendor code with leading zeros goes first."""
+        product = models.Product.objects.active().first()
+        self.assertEqual(product.url, self.search(f'{product.vendor_code:05}')[0].url)
+
+    def test_no_queries(self):
+        self.search('Prod')
+        with self.assertNumQueries(0):
+            self.search('Category')
+
+    def test_version_check_interval(self):
+        """The shared version is not requested on every keystroke."""
+        self.search('Prod')
+        with mock.patch.object(cache, 'get_or_set') as get_or_set:
+            self.search('Category')
+        get_or_set.assert_not_called()
+
+    def test_product_change_invalidates_index(self):
+        self.search('Prod')
+        product = models.Product.objects.active().first()
+        product.name = 'Renamed product'
+        product.save()
+        self.assertEqual('Renamed product', self.search('Renamed')[0].name)
+
+    def test_cached_search(self):
+        """Normalized terms are searched once per index."""
+        index = logic.autocomplete.Index.get()
+        self.assertIs(index.cached_search('Prod', 10), index.cached_search(' prod ', 10))
+
+    def test_admin_search(self):
+        """Admin search finds objects in the index and queries only found ones."""
+        entity = logic.autocomplete.AdminSearch(
+            search_engine.Search(
+                name='product', qs=models.Product.objects.active(), fields=['name'],
+            ),
+            qs=models.Product.objects.active(),
+            type_='product',
+        )
+        product = models.Product.objects.active().first()
+        self.search(product.name)
+        with self.assertNumQueries(1):
+            found = list(entity.search(product.name))
+        self.assertEqual(product, found[0])
+
+
+@tag('fast')
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class SearchCache(TransactionTestCase):
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        logic.search_cache.invalidate()
+        self.searched = []
+
+    def search(self, term: str):
+        self.searched.append(term)
+        return ['result'] if term == 'алкалин' else []
+
+    def test_normalize(self):
+        self.assertEqual('елка 2 шт', logic.search_cache.normalize('  Ёлка  2\tшт '))
+
+    def test_switch_layout(self):
+        self.assertEqual('алкалин', logic.search_cache.switch_layout('Fkrfkby'))
+        self.assertEqual('fkrfkby', logic.search_cache.switch_layout('алкалин'))
+
+    def test_normalized_term_is_cached(self):
+        get_or_search = logic.search_cache.get_or_search
+        self.assertEqual(['result'], get_or_search('product', 'Алкалин ', self.search))
+        self.assertEqual(['result'], get_or_search('product', 'алкалин', self.search))
+        self.assertEqual(['алкалин'], self.searched)
+
+    def test_switched_layout(self):
+        """Term without results is searched with the other keyboard layout."""
+        self.assertEqual(
+            ['result'],
+            logic.search_cache.get_or_search('product', 'fkrfkby', self.search),
+        )
+        self.assertEqual(['fkrfkby', 'алкалин'], self.searched)
+
+    def test_product_change_invalidates_results(self):
+        logic.search_cache.get_or_search('product', 'алкалин', self.search)
+        models.Product.objects.first().save()
+        logic.search_cache.get_or_search('product', 'алкалин', self.search)
+        self.assertEqual(['алкалин', 'алкалин'], self.searched)
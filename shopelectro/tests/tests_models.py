@@ -2,11 +2,14 @@ from functools import partial
 from itertools import chain
 
 from django.conf import settings
+from django.db import connection
 from django.db.utils import IntegrityError
 from django.forms.models import model_to_dict
 from django.test import TestCase, TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
 
-from shopelectro.models import Category, MatrixBlock, Product, Tag, TagGroup
+from shopelectro.cart import SECart
+from shopelectro.models import Category, MatrixBlock, Order, Product, Tag, TagGroup
 
 
 @tag('fast')
@@ -28,8 +31,6 @@ class ProductModel(TestCase):
         except Exception as error:
             self.fail(f'Creation of existing product failed: {{ error }}')
 
-    # @todo #589:30m Create test for Order.set_positions
-
 
 @tag('fast')
 class TagModel(TestCase):
@@ -104,6 +105,28 @@ class QueryQuantities(TransactionTestCase):
             for block in blocks:
                 self.assertTrue(block.rows())
 
+    def test_set_positions(self):
+        """Order with any number of positions is saved with the same queries quantity."""
+        def get_cart(products):
+            cart = SECart(self.client.session)
+            for product in products:
+                cart.add(product, 2)
+            return cart
+
+        products = list(Product.objects.all()[:10])
+        small_cart, big_cart = get_cart(products[:1]), get_cart(products)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            Order(phone='+7 (222) 222 22 22').set_positions(small_cart)
+        with self.assertNumQueries(len(small_queries)):
+            order = Order(phone='+7 (222) 222 22 22').set_positions(big_cart)
+
+        self.assertEqual(len(products), order.positions.count())
+        self.assertEqual(
+            sum(product.price * 2 for product in products),
+            order.total_price,
+        )
+
 
 @tag('fast')
 class MatrixBlockModel(TestCase):
@@ -11,22 +11,30 @@ import typing
 from functools import lru_cache, partial
 from itertools import chain
 from operator import attrgetter
+from unittest import mock
 from urllib.parse import urlparse, quote
 from xml.etree import ElementTree as ET
 
 from bs4 import BeautifulSoup
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.paginator import EmptyPage
+from django.db import connection
 from django.db.models import Count, Q
 from django.http import HttpResponse
 from django.template.response import TemplateResponse
 from django.test import override_settings, TestCase, tag
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.translation import ugettext as _
 
 from catalog.helpers import reverse_catalog_url
 from pages import logic as pages_logic, models as pages_models
 from pages.urls import reverse_custom_page
-from shopelectro import logic, models, views
+from shopelectro import admin, cart, logic, mail, models, profiling, sitemaps, tasks, views
+from shopelectro.tests import helpers
 from shopelectro.views.service import generate_md5_for_ya_kassa, \
     YANDEX_REQUEST_PARAM
 
@@ -385,6 +393,30 @@ class SitemapXML(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+@tag('fast')
+class CategoryWithTagsSitemap(TestCase):
+
+    fixtures = ['dump.json']
+
+    def test_pairs(self):
+        """Every category has tags of its descendants' products."""
+        expected = {
+            (category, tag_)
+            for category in models.Category.objects.filter(page__is_active=True)
+            for tag_ in models.Tag.objects.filter(
+                products__in=models.Product.objects.filter_descendants(category),
+            )
+        }
+        self.assertTrue(expected)
+        self.assertEqual(expected, set(sitemaps.get_categories_with_tags()))
+
+    def test_queries_quantity(self):
+        """Pairs take the constant number of queries."""
+        with self.assertNumQueries(4):
+            for category, tag_ in sitemaps.get_categories_with_tags():
+                sitemaps.CategoryWithTagsSitemap().location((category, tag_))
+
+
 @tag('fast')
 class RobotsPage(TestCase):
 
@@ -916,6 +948,18 @@ class TestSearch(TestCase):
         )
         self.assertNotContains(response, '<div class="search-result-item">')
 
+    def test_vendor_code_redirect(self):
+        """Vendor code with leading zeros and the article prefix redirects to the product."""
+        product = models.Product.objects.active().exclude(category__isnull=True).first()
+        for term in [f'{product.vendor_code:05}', f'арт. {product.vendor_code}']:
+            response = self.client.get('/search/', {'term': term})
+            self.assertRedirects(response, product.url)
+
+    def test_unknown_vendor_code(self):
+        """Unknown vendor code is searched as a usual term."""
+        response = self.client.get('/search/', {'term': '32767'}, follow=True)
+        self.assertEqual(response.status_code, 200)
+
 
 @tag('fast')
 class Order(TestCase):
@@ -949,6 +993,129 @@ class Cart(TestCase):
         )
 
 
+@tag('fast')
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class CartState(TestCase):
+    """Cart state is cached by the cart version. See `shopelectro.cart`."""
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def add_to_cart(self, product):
+        return self.client.post(reverse('cart_add'), {'product': product.id, 'quantity': 1})
+
+    def test_version_cookie(self):
+        """Cart changes update the version cookie."""
+        product = models.Product.objects.first()
+        response = self.add_to_cart(product)
+        version = response.cookies[cart.VERSION_COOKIE].value
+
+        header = json_to_dict(self.client.get(reverse('cart_get')))['header']
+        self.assertIn(product.name, header)
+
+        response = self.client.post(reverse('cart_flush'))
+        self.assertNotEqual(version, response.cookies[cart.VERSION_COOKIE].value)
+        state = json_to_dict(self.client.get(reverse('cart_get')))
+        self.assertEqual(0, state['total_quantity'])
+
+    def test_session_without_version_cookie(self):
+        """Session cart is shown and gets the version cookie, e.g. after the cookie expiration."""
+        product = models.Product.objects.first()
+        self.add_to_cart(product)
+        del self.client.cookies[cart.VERSION_COOKIE]
+
+        response = self.client.get(reverse('cart_get'))
+        self.assertIn(product.name, json_to_dict(response)['header'])
+        self.assertTrue(response.cookies[cart.VERSION_COOKIE].value)
+
+    def get_quantity(self) -> int:
+        return json_to_dict(self.client.get(reverse('cart_get')))['total_quantity']
+
+    def test_expired_session(self):
+        """Version cookie without the session cookie is not trusted."""
+        self.add_to_cart(models.Product.objects.first())
+        self.assertEqual(1, self.get_quantity())
+
+        del self.client.cookies[settings.SESSION_COOKIE_NAME]
+        self.assertEqual(0, self.get_quantity())
+
+    def test_logout(self):
+        """The flushed session drops the version cookie."""
+        user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.client.force_login(user)
+        self.add_to_cart(models.Product.objects.first())
+        self.assertEqual(1, self.get_quantity())
+
+        response = self.client.get(reverse('admin:logout'))
+        self.assertFalse(response.cookies[cart.VERSION_COOKIE].value)
+        self.assertEqual(0, self.get_quantity())
+
+    def test_other_session(self):
+        """Version cookie is signed with the session key."""
+        self.add_to_cart(models.Product.objects.first())
+        self.assertEqual(1, self.get_quantity())
+
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'other-session-key'
+        self.assertEqual(0, self.get_quantity())
+
+    def test_empty_cart_skips_session(self):
+        """Cart state of the anonymous user without the version cookie needs no queries."""
+        self.client.get(reverse('cart_get'))
+        with self.assertNumQueries(0):
+            state = json_to_dict(self.client.get(reverse('cart_get')))
+        self.assertEqual(0, state['total_quantity'])
+
+    def test_cached_state(self):
+        """Cart state is rendered once per the cart version."""
+        self.add_to_cart(models.Product.objects.first())
+        self.client.get(reverse('cart_get'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('cart_get'))
+
+
+@tag('fast')
+@override_settings(SEARCH_MODE='fulltext')
+class FullTextSearch(TestCase):
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        # tests never commit, so signals don't update documents
+        logic.search.update()
+
+    def get_results(self, term: str) -> typing.List[str]:
+        response = self.client.get('/search/', {'term': term}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        return [
+            link.text.strip()
+            for link in get_soup(response).find_all(class_='search-result-link')
+        ]
+
+    def test_name(self):
+        self.assertIn('Category #0', self.get_results('Category'))
+
+    def test_tags(self):
+        """Products are found by their tags names."""
+        tag_ = models.Tag.objects.get(name='Apple')
+        product = tag_.products.active().exclude(category__isnull=True).first()
+        self.assertIn(product.name, self.get_results('Apple'))
+
+    def test_no_results(self):
+        self.assertFalse(self.get_results('Bugaga'))
+
+    def test_document_update(self):
+        """Updated document of the renamed product is found by the new name."""
+        product = models.Product.objects.active().exclude(category__isnull=True).first()
+        product.name = 'Renamed product'
+        product.save()
+        logic.search.update([product.page_id])
+        self.assertIn('Renamed product', self.get_results('Renamed'))
+
+
 @tag('fast', 'catalog')
 class InPack(ViewsTestCase):
 
@@ -1043,3 +1210,401 @@ class Header(ViewsTestCase):
             from_page = menu.children(root.name)
             from_logic = [p.name for p in children]
             self.assertEqual(from_logic, from_page)
+
+
+@tag('fast')
+@override_settings(PROFILING={**settings.PROFILING, 'sample_rate': 1})
+class Profiling(ViewsTestCase):
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        super().setUp()
+        profiling.profiles.clear()
+
+    def test_profile_request(self):
+        self.get_category_page()
+        profile, = profiling.profiles.all()
+        self.assertEqual('shopelectro.views.catalog.CategoryPage', profile['view'])
+        self.assertEqual(200, profile['status'])
+        self.assertGreater(profile['queries'], 0)
+        self.assertIsNotNone(profile['render_time'])
+
+    def test_duplicated_queries(self):
+        queries = [
+            {'sql': f'SELECT * FROM product WHERE id = {id_}', 'time': '0.001'}
+            for id_ in range(3)
+        ]
+        self.assertEqual(
+            [{'fingerprint': 'SELECT * FROM product WHERE id = ?', 'count': 3}],
+            profiling.duplicates(queries),
+        )
+
+    def test_captured_queries(self):
+        """Queries are captured without opening the db connection."""
+        with mock.patch.object(connection, 'ensure_connection') as ensure_connection:
+            with profiling.captured_queries() as queries:
+                pass
+        ensure_connection.assert_not_called()
+        self.assertEqual([], queries)
+
+        with profiling.captured_queries() as queries:
+            models.Product.objects.count()
+        self.assertEqual(1, len(queries))
+
+    @override_settings(PROFILING={**settings.PROFILING, 'sample_rate': 0})
+    def test_not_sampled(self):
+        self.get_category_page()
+        self.assertFalse(profiling.profiles.all())
+
+
+@tag('fast')
+@helpers.disable_celery
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class MailQueue(TestCase):
+    """Views put emails to the mail queue. The queue sends them to the SMTP stand-in."""
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        self.smtp = helpers.SMTPStandIn()
+        self.smtp.start()
+        smtp_settings = self.smtp.settings()
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+        self.addCleanup(self.smtp.stop)
+
+    def test_order_call(self):
+        response = self.client.post(
+            '/shop/order-call/', {'phone': '+7 (222) 222 22 22', 'time': '10:00', 'url': '/'},
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(self.smtp.messages))
+
+    def test_one_click_buy(self):
+        product = models.Product.objects.first()
+        response = self.client.post(
+            '/shop/one-click-buy/',
+            {'product': product.id, 'quantity': 1, 'phone': '+7 (222) 222 22 22'},
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(self.smtp.messages))
+
+    def test_idempotency(self):
+        message = mail.serialize(
+            EmailMessage('Subject', 'Body', 'shop@example.com', ['customer@example.com'])
+        )
+        tasks.send_mail('the-key', message)
+        tasks.send_mail('the-key', message)
+        self.assertEqual(1, len(self.smtp.messages))
+
+    def test_failed_send_is_retried(self):
+        message = mail.serialize(
+            EmailMessage('Subject', 'Body', 'shop@example.com', ['customer@example.com'])
+        )
+        with mock.patch.object(EmailMessage, 'send', side_effect=OSError('Connection refused')):
+            with self.assertRaises(OSError):
+                mail.send('the-key', message)
+        mail.send('the-key', message)
+        self.assertEqual(1, len(self.smtp.messages))
+
+    def test_attachments(self):
+        """Attachments are queued in the json-serializable form."""
+        email = EmailMessage('Subject', 'Body', 'shop@example.com', ['customer@example.com'])
+        email.attach('price.xlsx', b'\x00binary', 'application/octet-stream')
+        email.attach('notes.txt', 'Текст', 'text/plain')
+        message = json.loads(json.dumps(mail.serialize(email)))
+
+        self.assertEqual(email.attachments, mail.deserialize(message).attachments)
+
+    def test_order_emails_action(self):
+        """Admin action sends emails of all the selected orders with the single batch."""
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        orders = [
+            models.Order.objects.create(phone='+7 (222) 222 22 22', email=email)
+            for email in ['customer@example.com', '']
+        ]
+
+        response = self.client.post(
+            reverse('admin:shopelectro_order_changelist'),
+            {'action': 'send_order_emails', '_selected_action': [order.id for order in orders]},
+            follow=True,
+        )
+        progress_url = get_soup(response).find('a', text='Progress')['href']
+        batch = self.client.get(progress_url).context['batch']
+        self.assertEqual({'total': 2, 'sent': 2, 'failed': [], 'done': True}, batch)
+        self.assertTrue(self.smtp.messages)
+
+    def test_redelivered_batch(self):
+        """Redelivered batch task doesn't send emails of the orders again."""
+        order = models.Order.objects.create(phone='+7 (222) 222 22 22')
+        tasks.send_orders_batch('the-job', [order.id])
+        sent = len(self.smtp.messages)
+        tasks.send_orders_batch('the-job', [order.id])
+        self.assertEqual(sent, len(self.smtp.messages))
+        self.assertEqual(1, mail.get_batch('the-job')['sent'])
+
+    def test_template_is_loaded_once(self):
+        orders = [
+            models.Order.objects.create(phone='+7 (222) 222 22 22', email=email)
+            for email in ['customer@example.com', '']
+        ]
+        with mock.patch('shopelectro.mail.get_template', wraps=mail.get_template) as get_template:
+            tasks.send_orders_batch('the-job', [order.id for order in orders])
+        get_template.assert_called_once_with(mail.ORDER_TEMPLATE)
+        self.assertEqual(2, mail.get_batch('the-job')['sent'])
+
+    def test_failed_order(self):
+        """Any order failure is reported and the batch is finished."""
+        order = models.Order.objects.create(phone='+7 (222) 222 22 22')
+        with mock.patch('shopelectro.mail.order_messages', side_effect=ValueError('Broken template')):
+            tasks.send_orders_batch('the-job', [order.id])
+        self.assertEqual(
+            {'total': 1, 'sent': 0, 'failed': [order.id], 'done': True},
+            mail.get_batch('the-job'),
+        )
+
+
+@tag('fast')
+class TableEditorBulkAPI(TestCase):
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def patch(self, rows: list):
+        response = self.client.post(
+            reverse('table_editor_bulk_api'),
+            json.dumps({'rows': rows}),
+            content_type='application/json',
+        )
+        self.assertEqual(200, response.status_code)
+        return json_to_dict(response)['results']
+
+    def test_patch_rows(self):
+        products = list(models.Product.objects.order_by('id')[:3])
+        category = models.Category.objects.exclude(id=products[0].category_id).first()
+        results = self.patch([
+            {'id': products[0].id, 'name': 'Renamed product', 'category_name': category.name},
+            *({'id': product.id, 'price': 42} for product in products[1:]),
+        ])
+
+        self.assertTrue(all(result['ok'] for result in results))
+        renamed = models.Product.objects.select_related('page').get(id=products[0].id)
+        self.assertEqual('Renamed product', renamed.page.name)
+        self.assertEqual(category, renamed.category)
+        self.assertEqual(
+            [42, 42],
+            [product.price for product in models.Product.objects.filter(id__in=[
+                product.id for product in products[1:]
+            ]).order_by('id')],
+        )
+
+    def test_row_errors(self):
+        """Invalid rows are reported and skipped, valid ones are applied."""
+        first, second = models.Product.objects.order_by('id')[:2]
+        results = self.patch([
+            {'id': first.id, 'category_name': 'Unknown category'},
+            {'id': second.id, 'price': 42},
+            {'id': 0, 'price': 42},
+        ])
+        self.assertEqual([False, True, False], [result['ok'] for result in results])
+        self.assertIn('category_name', results[0]['errors'])
+        self.assertEqual(first.category, models.Product.objects.get(id=first.id).category)
+        self.assertEqual(42, models.Product.objects.get(id=second.id).price)
+
+    def test_unchanged_row(self):
+        """The patch, that changes nothing, keeps the product modification date."""
+        product = models.Product.objects.first()
+        results = self.patch([{'id': product.id, 'price': product.price, 'name': product.name}])
+        self.assertTrue(results[0]['ok'])
+        self.assertEqual(
+            product.date_updated, models.Product.objects.get(id=product.id).date_updated,
+        )
+
+    def test_date_updated_is_read_only(self):
+        product = models.Product.objects.first()
+        results = self.patch([{'id': product.id, 'date_updated': '2000-01-01T00:00:00'}])
+        self.assertIn('date_updated', results[0]['errors'])
+
+    def test_change_permission(self):
+        """Staff without the product change permission can't edit products."""
+        staff = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        self.client.force_login(staff)
+        product = models.Product.objects.first()
+        response = self.client.post(
+            reverse('table_editor_bulk_api'),
+            json.dumps({'rows': [{'id': product.id, 'price': 42}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(403, response.status_code)
+        self.assertEqual(product.price, models.Product.objects.get(id=product.id).price)
+
+    def test_bulk_queries(self):
+        """Products are updated with the same queries quantity regardless of their count."""
+        def patch_prices(products):
+            with CaptureQueriesContext(connection) as queries:
+                self.patch([{'id': product.id, 'price': 42} for product in products])
+            return len(queries)
+
+        products = list(models.Product.objects.order_by('id')[:10])
+        self.assertEqual(patch_prices(products[:1]), patch_prices(products))
+
+
+@tag('fast')
+class TableEditorFeed(TestCase):
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def get(self, **params):
+        return self.client.get(reverse('table_editor_feed'), params)
+
+    def test_page(self):
+        response = self.get(
+            columns='name,price,category_name,page_is_active', sort='-price', per_page=5, page=2,
+        )
+        self.assertEqual(200, response.status_code)
+        feed = json_to_dict(response)
+        self.assertEqual(models.Product.objects.count(), feed['count'])
+        self.assertEqual(2, feed['page'])
+
+        product = (
+            models.Product.objects
+            .select_related('category', 'page')
+            .order_by('-price', 'id')[5]
+        )
+        self.assertEqual(
+            {
+                'id': product.id,
+                'name': product.name,
+                'price': product.price,
+                'category_name': product.category.name,
+                'page_is_active': product.page.is_active,
+            },
+            feed['rows'][0],
+        )
+
+    def test_filters(self):
+        category = models.Category.objects.filter(products__isnull=False).first()
+        feed = json_to_dict(self.get(
+            columns='category_name', **{'filter[category_name]': category.name},
+        ))
+        self.assertEqual(category.products.count(), feed['count'])
+        self.assertTrue(all(row['category_name'] == category.name for row in feed['rows']))
+
+    def test_unknown_column(self):
+        self.assertEqual(400, self.get(columns='vendor_code').status_code)
+
+    def test_unknown_filter(self):
+        self.assertEqual(400, self.get(**{'filter[vendor_code]': '1'}).status_code)
+
+    def test_other_params_are_ignored(self):
+        """Params, like the jquery cache buster, are not filters."""
+        response = self.get(columns='name', _='1561234567890')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(models.Product.objects.count(), json_to_dict(response)['count'])
+
+    def test_export(self):
+        response = self.get(columns='name', export=1)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(models.Product.objects.count(), len(rows))
+
+
+@tag('fast')
+class AdminChangelistCount(TestCase):
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def test_small_changelist_exact_count(self):
+        qs = models.Product.objects.all()
+        self.assertEqual(qs.count(), admin.EstimatedCountPaginator(qs, 10).count)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_big_changelist_estimated_count(self):
+        """Big changelist is counted with the single planner estimate."""
+        qs = models.Product.objects.all()
+        with self.assertNumQueries(1):
+            self.assertGreater(admin.EstimatedCountPaginator(qs, 10).count, 0)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_changelist(self):
+        response = self.client.get(reverse('admin:shopelectro_productpage_changelist'))
+        self.assertEqual(200, response.status_code)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_overestimated_count(self):
+        """Pages after the real rows are not found, the last page clamps the count."""
+        qs = models.Product.objects.order_by('id')
+        count = qs.count()
+        last = (count - 1) // 10 + 1
+        with mock.patch('shopelectro.admin.estimate_count', return_value=count * 100):
+            paginator = admin.EstimatedCountPaginator(qs, 10)
+            self.assertEqual(count * 100, paginator.count)
+
+            page = paginator.page(last)
+            self.assertFalse(page.has_next())
+            self.assertEqual(count, paginator.count)
+            self.assertEqual(last, paginator.num_pages)
+            with self.assertRaises(EmptyPage):
+                paginator.page(last + 1)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_underestimated_count(self):
+        """Pages of the real rows are found, even if the estimate is lower."""
+        qs = models.Product.objects.order_by('id')
+        with mock.patch('shopelectro.admin.estimate_count', return_value=1):
+            paginator = admin.EstimatedCountPaginator(qs, 1)
+            page = paginator.page(2)
+        self.assertEqual([qs[1]], list(page.object_list))
+        self.assertTrue(page.has_next())
+
+
+@tag('fast')
+class AdminTagChangelists(TestCase):
+    """Tag changelists take the same queries quantity regardless of rows count."""
+
+    fixtures = ['dump.json']
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def get_queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(200, self.client.get(url).status_code)
+        return len(queries)
+
+    def add_groups(self):
+        for i in range(3):
+            group = models.TagGroup.objects.create(name=f'Added group {i}')
+            models.Tag.objects.create(name=f'Added tag {i}', group=group)
+
+    def assert_constant_queries(self, url: str):
+        self.get_queries(url)  # warm up the session and the content types
+        queries = self.get_queries(url)
+        self.add_groups()
+        self.assertEqual(queries, self.get_queries(url))
+
+    def test_tag_groups(self):
+        self.assert_constant_queries(reverse('admin:shopelectro_taggroup_changelist'))
+
+    def test_tags(self):
+        self.assert_constant_queries(reverse('admin:shopelectro_tag_changelist'))
+
+    def test_tags_count(self):
+        group = models.TagGroup.objects.annotate(count=Count('tags')).first()
+        response = self.client.get(reverse('admin:shopelectro_taggroup_changelist'))
+        self.assertContains(response, f'<td class="field-count_tags">{group.count}</td>')
@@ -1,17 +1,17 @@
-from collections import OrderedDict
 from datetime import timedelta
 
 from django.conf import settings
 from django.conf.urls import url, include
 from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
-from django.views.decorators.cache import cache_page, never_cache
+from django.views.decorators.cache import never_cache
 from django.views.generic import TemplateView
 
 from pages.urls import custom_page_url
 from pages.views import RobotsView, SitemapPage
-from shopelectro import sitemaps, views
+from shopelectro import invalidation, sitemaps, views
 from shopelectro.admin import se_admin
+from shopelectro.middleware import cache_page
 
 
 def cached_time(*args, **kwargs) -> int:
@@ -19,23 +19,14 @@ def cached_time(*args, **kwargs) -> int:
     return int(timedelta(*args, **kwargs).total_seconds())
 
 
-# Orders sitemaps instances
-sitemaps = OrderedDict([
-    ('index', sitemaps.IndexSitemap),
-    ('category', sitemaps.CategorySitemap),
-    ('category-with-tags', sitemaps.CategoryWithTagsSitemap),
-    ('products', sitemaps.ProductSitemap),
-    ('site', sitemaps.PagesSitemap)
-])
-
 # disable cache
 if settings.DEBUG:
-    def cache_page(arg):  # Ignore PyFlakesBear
+    def cache_page(arg, **kwargs):  # Ignore PyFlakesBear
         if callable(arg):
             return arg
         return cache_page
 
-cached_60d = cache_page(cached_time(days=60))
+cached_60d = cache_page(cached_time(days=60), dependencies=[invalidation.SITEMAP])
 cached_2h = cache_page(cached_time(hours=2))
 
 admin_urls = [
@@ -44,6 +35,16 @@ admin_urls = [
     url(r'^get-tree-items/$', views.Tree.as_view()),
     url(r'^redirect-to-product/$', views.RedirectToProduct.as_view()),
     url(r'^table-editor-api/$', views.TableEditorAPI.as_view()),
+    url(
+        r'^table-editor-api/bulk/$',
+        se_admin.admin_view(views.TableEditorBulkAPI.as_view()),
+        name='table_editor_bulk_api',
+    ),
+    url(
+        r'^table-editor-api/feed/$',
+        se_admin.admin_view(views.TableEditorFeed.as_view()),
+        name='table_editor_feed',
+    ),
     url(r'^select2/', include('django_select2.urls')),
 ]
 
@@ -115,6 +116,7 @@ urlpatterns = [
     url(r'^admin/', include(admin_urls)),
     url(r'^catalog/', include(catalog_urls)),
     url(r'^pages/', include('pages.urls')),
+    url(r'^csrf-cookie/$', views.csrf_cookie, name='csrf_cookie'),
     url(r'^save-feedback/$', views.save_feedback),
     url(r'^delete-feedback/$', views.delete_feedback),
     url(r'^set-view-type/$', views.set_view_type, name='set_view_type'),
@@ -122,7 +124,7 @@ urlpatterns = [
     url(r'^search/', include(search_urls)),
     url(r'^service/', include(service_urls)),
     url(r'^sms/$', TemplateView.as_view(template_name='sms_landing.html'), name='sms_lending'),
-    url(r'^sitemap\.xml$', cached_60d(sitemap), {'sitemaps': sitemaps}, name='sitemap'),
+    url(r'^sitemap\.xml$', cached_60d(sitemap), {'sitemaps': sitemaps.SITEMAPS}, name='sitemap'),
 ]
 
 if settings.DEBUG:
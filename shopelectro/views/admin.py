@@ -1,8 +1,17 @@
+import json
+import re
+
+from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import ObjectDoesNotExist
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.views.generic import View
 
 from generic_admin import views as admin_views
-
-from shopelectro import forms, models
+from pages import models as pages_models
+from shopelectro import forms, logic, models
 
 
 def category_name_strategy(entity, related_model_entity, related_model_value):
@@ -43,6 +52,8 @@ class GenericTableEditor:
         'category', 'page', 'property', 'property_id', 'page_id',
         'category_id', 'id', 'product_feedbacks', 'tags', 'uuid',
         'vendor_code',
+        # `Product.save` maintains it
+        'date_updated',
     ]
 
     field_controller = admin_views.TableEditorFieldsControlMixin(
@@ -53,6 +64,21 @@ class GenericTableEditor:
         excluded_related_model_fields=excluded_related_model_fields
     )
 
+    def get_table_fields(self) -> dict:
+        """Editable product and page fields of the table."""
+        def editable(model, excluded):
+            return [
+                field.name for field in model._meta.concrete_fields
+                if field.editable and field.name not in excluded
+            ]
+
+        return {
+            'product_fields': editable(self.model, self.excluded_model_fields),
+            'page_fields': editable(
+                pages_models.Page, self.excluded_related_model_fields['page'],
+            ),
+        }
+
 
 class TableEditorAPI(GenericTableEditor, admin_views.TableEditorAPI):
 
@@ -66,6 +92,76 @@ class TableEditorAPI(GenericTableEditor, admin_views.TableEditorAPI):
     }
 
 
+class TableEditorBulkAPI(PermissionRequiredMixin, GenericTableEditor, View):
+    """
+    Apply edits of many rows in one request.
+
+    Request body is `{"rows": [{"id": <product id>, "<field>": <value>, ...}, ...]}`.
+    Related fields are `category_name` and `page_<field>`, as in the table editor.
+    Response contains the result of every row.
+    """
+
+    permission_required = 'shopelectro.change_product'
+    raise_exception = True
+
+    def post(self, request):
+        try:
+            rows = json.loads(request.body.decode('utf-8'))['rows']
+        except (ValueError, KeyError, TypeError):
+            return HttpResponseBadRequest('Body should be json with the list of rows.')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return HttpResponseBadRequest('Body should be json with the list of rows.')
+        patches = logic.table_editor.Patches(**self.get_table_fields())
+        return JsonResponse({'results': patches.apply(rows)})
+
+
+class TableEditorFeed(GenericTableEditor, View):
+    """
+    Page of the table editor rows with the requested columns only.
+
+    Query params are `columns` separated with commas, `page`, `per_page`,
+    `sort` column with the optional `-` and `term`, that is a part of the product name.
+    `filter[<column>]` params are exact values of the columns.
+    Other params, like the `_` cache buster of jquery, are ignored.
+    `export=1` streams all the rows as json lines instead of the page.
+    """
+
+    per_page = 100
+    max_per_page = 1000
+    filter_param = re.compile(r'^filter\[(?P<column>[^\]]+)\]$')
+
+    def get_filters(self, params) -> dict:
+        matches = (self.filter_param.match(param) for param in params)
+        return {match.group('column'): params[match.string] for match in matches if match}
+
+    def get(self, request):
+        params = request.GET
+        feed = logic.table_editor.Feed(**self.get_table_fields())
+        try:
+            rows = feed.get_rows(
+                columns=list(filter(None, params.get('columns', 'id').split(','))),
+                filters=self.get_filters(params),
+                term=params.get('term', ''),
+                sort=params.get('sort', 'id'),
+            )
+            if params.get('export'):
+                return StreamingHttpResponse(
+                    (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows.iterator()),
+                    content_type='application/x-ndjson',
+                )
+            per_page = int(params.get('per_page', self.per_page))
+            paginator = Paginator(rows, min(max(per_page, 1), self.max_per_page))
+            page = paginator.page(params.get('page', 1))
+        except (ValidationError, ValueError, InvalidPage) as error:
+            return HttpResponseBadRequest(str(error))
+        return JsonResponse({
+            'count': paginator.count,
+            'page': page.number,
+            'pages': paginator.num_pages,
+            'rows': list(page),
+        })
+
+
 class TableEditor(GenericTableEditor, admin_views.TableEditor):
     pass
 
@@ -5,7 +5,6 @@ from django.conf import settings
 from django.shortcuts import render
 from django.urls import reverse
 from django.views.decorators.http import require_POST
-from django_user_agents.utils import get_user_agent
 
 from catalog import context
 from catalog.views import catalog
@@ -13,9 +12,8 @@ from images.models import Image
 # can't do `import pages` because of django error.
 # Traceback: https://gist.github.com/duker33/685e8a9f59fc5dbd243e297e77aaca42
 from pages import models as pages_models, views as pages_views
-from shopelectro import context as se_context, models, request_data
+from shopelectro import context as se_context, devices, invalidation, models, request_data
 from shopelectro.exception import Http400
-from shopelectro.views.helpers import set_csrf_cookie
 
 
 def category_matrix(request, page: str):
@@ -27,7 +25,6 @@ def category_matrix(request, page: str):
     return render(request, 'catalog/catalog.html', context_)
 
 
-@set_csrf_cookie
 class ProductPage(catalog.ProductPage):
     pk_url_kwarg = None
     slug_url_kwarg = 'product_vendor_code'
@@ -64,6 +61,7 @@ class ProductPage(catalog.ProductPage):
             # with it's own logic
             return context_
 
+        invalidation.depend(self.request, invalidation.product(self.product.id))
         tile_products = self.product.get_siblings(
             offset=settings.PRODUCT_SIBLINGS_COUNT
         )
@@ -110,7 +108,6 @@ class ProductPage(catalog.ProductPage):
 
 
 # SHOPELECTRO-SPECIFIC VIEWS
-@set_csrf_cookie
 class IndexPage(pages_views.CustomPageView):
 
     @staticmethod
@@ -127,7 +124,10 @@ class IndexPage(pages_views.CustomPageView):
     def get_context_data(self, **kwargs):
         """Extended method. Add product's images to context."""
         context_ = super(IndexPage, self).get_context_data(**kwargs)
-        mobile_view = get_user_agent(self.request).is_mobile
+        mobile_view = devices.is_mobile(self.request)
+        invalidation.depend(
+            self.request, *map(invalidation.product, settings.TOP_PRODUCTS),
+        )
 
         tile_products = []
         top_products = (
@@ -151,12 +151,12 @@ class IndexPage(pages_views.CustomPageView):
         }
 
 
-@set_csrf_cookie
 class CategoryPage(catalog.CategoryPageTemplate):
 
     def get_context_data(self, **kwargs):
         """Add sorting options and view_types in context."""
         request_data_ = request_data.Catalog(self.request, self.kwargs)
+        invalidation.depend(self.request, invalidation.category(request_data_.slug))
         return {
             **super().get_context_data(**kwargs),
             **se_context.Catalog(request_data_).context(),
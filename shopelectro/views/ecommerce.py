@@ -9,6 +9,7 @@ from django.views.decorators.http import require_POST
 from ecommerce import mailer, views as ec_views
 from pages.models import CustomPage
 
+from shopelectro import cart as se_cart
 from shopelectro.cart import SECart
 from shopelectro.forms import OrderForm
 from shopelectro.models import Product, Order
@@ -44,7 +45,8 @@ class Cart(ec_views.CartModifier):
     order_form = OrderForm
 
     def get(self, request):
-        return self.json_response(request)
+        """Return the cached cart state. Header cart loads it on every page."""
+        return JsonResponse(se_cart.get_state(request))
 
 
 class AddToCart(ec_views.AddToCart):
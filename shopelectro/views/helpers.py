@@ -1,11 +1,19 @@
 from django.http import HttpResponse
-from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
 
 
-# Sets CSRF-cookie to CBVs.
-set_csrf_cookie = method_decorator(ensure_csrf_cookie, name='dispatch')
+@never_cache
+@ensure_csrf_cookie
+def csrf_cookie(request):
+    """
+    Set the CSRF cookie for the ajax forms.
+
+    Cached pages don't set it: the page cache doesn't store responses,
+    that set cookies to the requests without cookies.
+    """
+    return HttpResponse(status=204)
 
 
 @require_POST
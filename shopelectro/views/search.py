@@ -1,90 +1,189 @@
+import re
+import typing
+from urllib.parse import urlencode
+
 from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.views.generic import View
 
 from pages.models import Page
+from pages.urls import reverse_custom_page
 from search import views as search_views, search as search_engine
-from shopelectro.models import Category, Product
+from shopelectro import logic
+from shopelectro.models import Category, Product, VENDOR_CODE_MAX
+
+
+CATEGORIES = Category.objects.active()
+PRODUCTS = Product.objects.active().exclude(category__isnull=True)
+PAGES = Page.objects.active().exclude(type=Page.MODEL_TYPE)
+
+# vendor code with the optional article prefix: `123`, `00123`, `арт. 123`
+VENDOR_CODE = re.compile(r'^(?:арт|art)?\.?\s*([0-9]{1,6})$', re.IGNORECASE)
+
+
+def get_vendor_code(term: str) -> typing.Optional[int]:
+    """Return the vendor code, that the term looks like. Leading zeros are stripped as 1C does."""
+    match = VENDOR_CODE.match(term.strip())
+    if not match:
+        return None
+    vendor_code = int(match.group(1).lstrip('0') or 0)
+    return vendor_code if 0 < vendor_code <= VENDOR_CODE_MAX else None
 
 
 class Search(search_views.SearchView):
+    def get(self, request, *args, **kwargs):
+        # the exact vendor code redirects without the search of all entities
+        vendor_code = get_vendor_code(request.GET.get('term', ''))
+        if vendor_code and PRODUCTS.filter(vendor_code=vendor_code).exists():
+            return redirect('product', vendor_code)
+        return super().get(request, *args, **kwargs)
+
     def get_redirect_search_entity(self):
         return next(s for s in self.search_entities if s.name == 'product')
 
+    @property
+    def search_entities(self):
+        if settings.SEARCH_MODE == 'fulltext':
+            return self.fulltext_entities
+        return self.trigram_entities
+
     # ignore CPDBear
-    search_entities = [
-        search_engine.Search(
-            name='category',
-            qs=Category.objects.active(),
-            fields=['name'],  # Ignore CPDBear
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+    trigram_entities = [
+        logic.search_cache.CachedSearch(
+            search_engine.Search(
+                name='category',
+                qs=CATEGORIES,
+                fields=['name'],  # Ignore CPDBear
+                min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+            ),
+            qs=CATEGORIES,
+            key='trigram:category',
+        ),
+        logic.search_cache.CachedSearch(
+            search_engine.Search(
+                name='product',
+                qs=PRODUCTS,
+                fields=['name'],
+                redirect_field='vendor_code',
+                min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+            ),
+            qs=PRODUCTS,
+            key='trigram:product',
         ),
-        search_engine.Search(
-            name='product',
-            qs=Product.objects.active().exclude(category__isnull=True),
-            fields=['name'],
-            redirect_field='vendor_code',
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+        logic.search_cache.CachedSearch(
+            search_engine.Search(
+                name='page',  # Ignore CPDBear
+                qs=PAGES,
+                fields=['name'],
+                min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+            ),
+            qs=PAGES,
+            key='trigram:page',
         ),
-        search_engine.Search(
-            name='page',  # Ignore CPDBear
-            qs=Page.objects.active().exclude(type=Page.MODEL_TYPE),
-            fields=['name'],
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
-        )
     ]
 
-    redirect_field = 'vendor_code'
-
-
-class Autocomplete(search_views.AutocompleteView):
-
     # ignore CPDBear
-    search_entities = [
-        search_engine.Search(
-            name='category',
-            qs=Category.objects.filter(page__is_active=True),
-            fields=['name', 'id'],
-            template_fields=['name', 'url'],
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+    fulltext_entities = [
+        logic.search_cache.CachedSearch(
+            logic.search.Search(
+                name='category',
+                qs=CATEGORIES,
+                fields=['name'],
+                document_field='page__search_document__document',
+            ),
+            qs=CATEGORIES,
+            key='fulltext:category',
+        ),
+        logic.search_cache.CachedSearch(
+            logic.search.Search(
+                name='product',
+                qs=PRODUCTS,
+                fields=['name'],
+                redirect_field='vendor_code',
+                document_field='page__search_document__document',
+            ),
+            qs=PRODUCTS,
+            key='fulltext:product',
         ),
-        search_engine.Search(
-            name='product',
-            qs=Product.objects.active(),
-            fields=['name', 'id', 'vendor_code'],
-            template_fields=['name', 'price', 'url'],  # Ignore CPDBear
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+        logic.search_cache.CachedSearch(
+            logic.search.Search(
+                name='page',
+                qs=PAGES,
+                fields=['name'],
+                document_field='search_document__document',
+            ),
+            qs=PAGES,
+            key='fulltext:page',
         ),
-        search_engine.Search(
-            name='pages',
-            qs=Page.objects.filter(is_active=True).exclude(type=Page.MODEL_TYPE),
-            fields=['name'],
-            template_fields=['name', 'url'],
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
-        )
     ]
 
+    redirect_field = 'vendor_code'
+
+
+class Autocomplete(View):
+    """
+    Autocomplete from the in-memory index. It doesn't query the db on keystrokes.
+
+    Entries of the popular terms are cached in the process memory.
+    """
+
+    limit = 10
     see_all_label = settings.SEARCH_SEE_ALL_LABEL
 
+    def get(self, request):
+        term = request.GET.get('term', '')
+        entries = logic.autocomplete.Index.get().cached_search(term, self.limit)
+        if not entries:
+            return JsonResponse([], safe=False)
+        return JsonResponse([
+            *(entry.as_dict() for entry in entries),
+            {
+                'type': 'see_all',
+                'name': self.see_all_label,
+                'url': f'{reverse_custom_page("search")}?{urlencode({"term": term})}',
+            },
+        ], safe=False)
+
+
+ADMIN_CATEGORIES = Category.objects.filter(page__is_active=True)
+ADMIN_PRODUCTS = Product.objects.active()
+ADMIN_PAGES = Page.objects.filter(is_active=True).exclude(type=Page.MODEL_TYPE)
+
 
 class AdminAutocomplete(search_views.AdminAutocompleteView):
+    """Admin autocomplete from the in-memory index. Querysets are the same, as the index has."""
 
     # ignore CPDBear
     search_entities = [
-        search_engine.Search(
-            name='category',
-            qs=Category.objects.filter(page__is_active=True),
-            fields=['name'],
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+        logic.autocomplete.AdminSearch(
+            search_engine.Search(
+                name='category',
+                qs=ADMIN_CATEGORIES,
+                fields=['name'],
+                min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+            ),
+            qs=ADMIN_CATEGORIES,
+            type_='category',
+        ),
+        logic.autocomplete.AdminSearch(
+            search_engine.Search(
+                name='product',
+                qs=ADMIN_PRODUCTS,
+                fields=['name'],
+                min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+            ),
+            qs=ADMIN_PRODUCTS,
+            type_='product',
         ),
-        search_engine.Search(
-            name='product',
-            qs=Product.objects.active(),
-            fields=['name'],
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+        logic.autocomplete.AdminSearch(
+            search_engine.Search(
+                name='pages',
+                qs=ADMIN_PAGES,
+                fields=['name'],
+                min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
+            ),
+            qs=ADMIN_PAGES,
+            type_='pages',
         ),
-        search_engine.Search(
-            name='pages',
-            qs=Page.objects.filter(is_active=True).exclude(type=Page.MODEL_TYPE),
-            fields=['name'],
-            min_similarity=settings.TRIGRAM_MIN_SIMILARITY,
-        )
     ]